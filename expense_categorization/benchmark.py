@@ -0,0 +1,283 @@
+"""Benchmarks for expense categorization on synthetic statements.
+
+Generates fake Chase-style transactions and keyword sets so nothing here needs
+a real `config.json` or `inputs/` directory. Run with:
+
+    python benchmark.py keywords --keywords 5000 --years 10
+    python benchmark.py ingest --cards 12 --months 24
+    python benchmark.py report --transactions 500000
+"""
+import argparse
+from collections import defaultdict
+import csv
+from datetime import date, timedelta
+import json
+import os
+import random
+import shutil
+import statistics
+import string
+import tempfile
+import time
+
+from keyword_index import KeywordIndex
+from report import Report
+from store import TransactionStore
+
+
+def random_word(rng, min_length=3, max_length=10):
+    length = rng.randint(min_length, max_length)
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(length))
+
+
+def generate_keywords(rng, count):
+    keywords = set()
+    while len(keywords) < count:
+        keywords.add(random_word(rng, 4, 12))
+    return sorted(keywords)
+
+
+def generate_descriptions(rng, keywords, count, hit_rate=0.8):
+    descriptions = []
+    for _ in range(count):
+        words = [random_word(rng) for _ in range(rng.randint(1, 3))]
+        if rng.random() < hit_rate:
+            words.insert(rng.randint(0, len(words)), rng.choice(keywords))
+        words.append('#{}'.format(rng.randint(1000, 99999)))
+        descriptions.append(' '.join(words))
+    return descriptions
+
+
+def write_statement(rng, path, start_date, end_date, descriptions, count):
+    days = (end_date - start_date).days
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Transaction Date', 'Post Date', 'Description', 'Category', 'Type', 'Amount'])
+        for _ in range(count):
+            transaction_date = start_date + timedelta(days=rng.randint(0, days))
+            writer.writerow([
+                transaction_date.strftime('%m/%d/%Y'),
+                (transaction_date + timedelta(days=1)).strftime('%m/%d/%Y'),
+                rng.choice(descriptions),
+                'Shopping',
+                'Sale',
+                '-{:.2f}'.format(rng.uniform(1, 500)),
+            ])
+
+
+def generate_workspace(rng, directory, cards, months, per_month, keyword_count, categories=12):
+    """Write a config.json and a Chase export per card per month into `directory`.
+
+    Returns the paths of the generated exports.
+    """
+    keywords = generate_keywords(rng, keyword_count)
+    categorization = {'payments': []}
+    for i, keyword in enumerate(keywords):
+        categorization.setdefault('category_{}'.format(i % categories), []).append(keyword)
+    with open(os.path.join(directory, 'config.json'), 'w') as f:
+        json.dump({'categorization': categorization, 'unshared_categories': []}, f)
+
+    descriptions = generate_descriptions(rng, keywords, 2000, hit_rate=1)
+    inputs_dir = os.path.join(directory, 'inputs')
+    os.makedirs(inputs_dir)
+    paths = []
+    for card in range(1000, 1000 + cards):
+        for month in range(months):
+            start_date = date(2015 + month // 12, month % 12 + 1, 1)
+            end_date = (start_date + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+            filename = 'Chase{}_Activity{}_{}_{}.CSV'.format(
+                card,
+                start_date.strftime('%Y%m%d'),
+                end_date.strftime('%Y%m%d'),
+                end_date.strftime('%Y%m%d'),
+            )
+            path = os.path.join(inputs_dir, filename)
+            write_statement(rng, path, start_date, end_date, descriptions, per_month)
+            paths.append(path)
+    return paths
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def scan_all(keywords, descriptions):
+    return [{k for k in keywords if k in d} for d in descriptions]
+
+
+def index_all(index, descriptions):
+    return [index.find(d) for d in descriptions]
+
+
+def bench_keywords(args):
+    rng = random.Random(args.seed)
+    keywords = generate_keywords(rng, args.keywords)
+    count = args.years * 12 * args.per_month
+    descriptions = generate_descriptions(rng, keywords, count)
+    print('{} keywords, {} transactions ({} years)'.format(len(keywords), count, args.years))
+
+    index, build_time = timed(KeywordIndex, keywords)
+    print('  index build:     {:.3f}s'.format(build_time))
+
+    scanned, scan_time = timed(scan_all, keywords, descriptions)
+    print('  substring scan:  {:.3f}s'.format(scan_time))
+
+    indexed, index_time = timed(index_all, index, descriptions)
+    print('  keyword index:   {:.3f}s ({:.1f}x)'.format(index_time, scan_time / index_time))
+
+    assert scanned == indexed, 'keyword index disagrees with substring scan'
+
+
+def ingest_workspace(template, directory, jobs):
+    """Ingest every export in a fresh copy of `template`, made at `directory`.
+
+    Each run gets its own empty description cache, so neither mode is timed
+    against matches the other one already cached.
+    """
+    import categorize
+
+    shutil.copytree(template, directory)
+    os.chdir(directory)
+    # categorize opens its cache relative to the working directory; workers
+    # (forked or spawned) open it again there.
+    config = categorize._config
+    config.description_cache = categorize.DescriptionCache(config.description_cache_filename, config.search_terms)
+    inputs_dir = os.path.join(directory, 'inputs')
+    paths = [os.path.join(inputs_dir, f) for f in sorted(os.listdir(inputs_dir))]
+    ingested, seconds = timed(categorize.ingest_files, paths, jobs)
+    store, _ = categorize.merge_ingested(ingested)
+    return store, seconds
+
+
+def bench_ingest(args):
+    rng = random.Random(args.seed)
+    modes = [('serial', 1), ('parallel', args.jobs)]
+    seconds = {name: [] for name, _ in modes}
+    stores = {}
+    with tempfile.TemporaryDirectory() as directory:
+        template = os.path.join(directory, 'template')
+        os.makedirs(template)
+        paths = generate_workspace(rng, template, args.cards, args.months, args.per_month, args.keywords)
+        print('{} cards, {} statements, {} transactions, {} keywords, best of {}'.format(
+            args.cards,
+            len(paths),
+            len(paths) * args.per_month,
+            args.keywords,
+            args.repeats,
+        ))
+
+        # categorize.py loads ./config.json on import.
+        cwd = os.getcwd()
+        os.chdir(template)
+        try:
+            for repeat in range(args.repeats):
+                # Alternate which mode goes first, so neither always gets the
+                # warmer page cache.
+                for name, jobs in (modes if repeat % 2 == 0 else modes[::-1]):
+                    workspace = os.path.join(directory, '{}_{}'.format(name, repeat))
+                    stores[name], run_seconds = ingest_workspace(template, workspace, jobs)
+                    seconds[name].append(run_seconds)
+        finally:
+            os.chdir(cwd)
+
+    serial_time = min(seconds['serial'])
+    parallel_time = min(seconds['parallel'])
+    print('  serial:    {:.3f}s (median {:.3f}s)'.format(serial_time, statistics.median(seconds['serial'])))
+    print('  parallel:  {:.3f}s (median {:.3f}s, {:.1f}x, {} jobs)'.format(
+        parallel_time,
+        statistics.median(seconds['parallel']),
+        serial_time / parallel_time,
+        args.jobs or os.cpu_count(),
+    ))
+    assert list(stores['serial'].amounts) == list(stores['parallel'].amounts), 'parallel ingestion disagrees with serial'
+
+
+def generate_store(rng, count, categories, cards, descriptions):
+    store = TransactionStore()
+    first_day = date(2015, 1, 1).toordinal()
+    for _ in range(count):
+        store.append(
+            first_day + rng.randint(0, 3650),
+            rng.choice(descriptions),
+            round(rng.uniform(-50, 500), 2),
+            rng.choice(categories),
+            rng.choice(cards),
+        )
+    return store
+
+
+def loop_aggregates(store, categories):
+    """The per-transaction dict accumulation write_output used to do."""
+    total_by_category = {c: 0 for c in categories}
+    by_month = defaultdict(lambda: {c: 0 for c in categories})
+    by_card = defaultdict(lambda: {c: 0 for c in categories})
+    for i in store.sorted_indexes():
+        amount = store.amounts[i]
+        category = store.category(i)
+        month = date.fromordinal(store.dates[i]).strftime('%Y-%m')
+        total_by_category[category] += amount
+        by_month[month][category] += amount
+        by_card[store.card(i)][category] += amount
+    return total_by_category, by_month, by_card
+
+
+def report_aggregates(store, categories):
+    report = Report(store, categories)
+    return report.totals_by_category(), report.by_month(), report.by_card(), list(report.listing())
+
+
+def bench_report(args):
+    rng = random.Random(args.seed)
+    categories = ['category_{}'.format(i) for i in range(args.categories)]
+    cards = [str(1000 + i) for i in range(args.cards)]
+    descriptions = generate_descriptions(rng, generate_keywords(rng, 500), 5000)
+    store = generate_store(rng, args.transactions, categories, cards, descriptions)
+    print('{} transactions, {} categories, {} cards'.format(len(store), len(categories), len(cards)))
+
+    (loop_totals, _, _), loop_time = timed(loop_aggregates, store, categories)
+    print('  python loops:  {:.3f}s (totals and pivots only)'.format(loop_time))
+
+    (report_totals, _, _, _), report_time = timed(report_aggregates, store, categories)
+    print('  report:        {:.3f}s (totals, pivots and sorted listing, {:.1f}x)'.format(
+        report_time,
+        loop_time / report_time,
+    ))
+
+    for category, total in zip(categories, report_totals.tolist()):
+        assert abs(loop_totals[category] - total) < 0.01, 'report disagrees with loop totals'
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seed', type=int, default=0)
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    keywords_parser = subparsers.add_parser('keywords', help='keyword matching: substring scan vs index')
+    keywords_parser.add_argument('--keywords', type=int, default=5000)
+    keywords_parser.add_argument('--years', type=int, default=10)
+    keywords_parser.add_argument('--per-month', type=int, default=150)
+    keywords_parser.set_defaults(func=bench_keywords)
+
+    ingest_parser = subparsers.add_parser('ingest', help='file ingestion: serial vs process pool')
+    ingest_parser.add_argument('--cards', type=int, default=12)
+    ingest_parser.add_argument('--months', type=int, default=24)
+    ingest_parser.add_argument('--per-month', type=int, default=300)
+    ingest_parser.add_argument('--keywords', type=int, default=2000)
+    ingest_parser.add_argument('--jobs', type=int)
+    ingest_parser.add_argument('--repeats', type=int, default=2, help='runs of each mode, alternating which goes first')
+    ingest_parser.set_defaults(func=bench_ingest)
+
+    report_parser = subparsers.add_parser('report', help='aggregation: python loops vs numpy report')
+    report_parser.add_argument('--transactions', type=int, default=500000)
+    report_parser.add_argument('--categories', type=int, default=15)
+    report_parser.add_argument('--cards', type=int, default=12)
+    report_parser.set_defaults(func=bench_report)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,25 +1,64 @@
+import argparse
+import atexit
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+import csv
 from datetime import date
+import io
 import json
 import os
 import re
 import sys
 
+from dedupe import FingerprintLedger, fingerprint_rows
+from description_cache import DescriptionCache
+from keyword_index import KeywordIndex
+from report import Report, pivot_csv
+from results import ResultsCache
+from rollup import load_summary, merge_summaries, save_summary, summarize
+from statement_index import StatementIndex, parse_period
+from store import TransactionStore, merge_stores, parse_chase_date, read_rows
+
 FILENAME_REGEX = re.compile(r"^Chase(?P<card>\d{4})_Activity(?P<start_year>\d{4})(?P<start_month>\d{2})(?P<start_day>\d{2})_(?P<end_year>\d{4})(?P<end_month>\d{2})(?P<end_day>\d{2})_(\d{8}).CSV$")
 
 DATE_FORMAT = '%Y %b %d'
 CONFIG_FILE_NAME = './config.json'
+CONFIG_JOURNAL_FILE_NAME = './config.json.journal'
+DESCRIPTION_CACHE_FILE_NAME = './categorization_cache.sqlite'
+RESULTS_FILE_NAME = './results.jsonl'
+REVIEW_QUEUE_FILE_NAME = './review_queue.csv'
+STATEMENT_INDEX_FILE_NAME = './statement_index.json'
+FINGERPRINT_LEDGER_FILE_NAME = './row_fingerprints.json'
 IN_DIR = './inputs'
 OUT_DIR = './output'
+PERIODS_DIR = './periods'
+ROLLUP_FILE_NAME = 'rollup.csv'
+
+# Keywords journaled before config.json is rewritten with all of them.
+JOURNAL_COMPACT_THRESHOLD = 100
 
 PAYMENT_CATEGORY = 'payments'
 SKIP_KEYWORDS = {'skip'}
 
 
 class Config(object):
-    def __init__(self, filename):
+    """config.json plus a journal of the keywords added since it was written.
+
+    New keywords are appended to the journal and applied to the in-memory
+    search terms in place; config.json is only rewritten by `compact`, once
+    the journal reaches JOURNAL_COMPACT_THRESHOLD entries or at exit.
+
+    Ingestion workers import this module and load their own Config, so the
+    exit-time compaction is registered by `__main__` alone; a worker only
+    ever reads the config and the journal.
+    """
+
+    def __init__(self, filename, journal_filename, description_cache_filename):
         self.filename = filename
+        self.journal_filename = journal_filename
+        self.description_cache_filename = description_cache_filename
         self._config = None
+        self._journal_length = 0
         self.categories = None
         self.categorization = None
         self.unshared_categories = None
@@ -30,20 +69,72 @@ class Config(object):
         self.categories = sorted(self._config['categorization'].keys())
         self.categorization = self._config['categorization']
         self.unshared_categories = set(self._config['unshared_categories'])
+        self._journal_length = self.replay_journal()
         self.search_terms = self.get_search_term_dict()
+        self.keyword_index = KeywordIndex(self.search_terms)
+        self.description_cache = DescriptionCache(self.description_cache_filename, self.search_terms)
 
     def serialize(self):
         return json.dumps(self._config, indent=4, sort_keys=True)
 
+    def replay_journal(self):
+        if not os.path.exists(self.journal_filename):
+            return 0
+        length = 0
+        with open(self.journal_filename, 'r') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                keywords = self.categorization[entry['category']]
+                if entry['keyword'] not in keywords:
+                    keywords.append(entry['keyword'])
+                length += 1
+        return length
+
+    def compact(self):
+        if not self._journal_length:
+            return
+        temp_filename = '{}.tmp'.format(self.filename)
+        with open(temp_filename, 'w') as f:
+            f.write(self.serialize())
+        os.replace(temp_filename, self.filename)
+        os.remove(self.journal_filename)
+        self._journal_length = 0
+
     def add_keyword_to_known_categorization(self, category, keyword):
-        existing_keywords = set(self.categorization[category])
-        if keyword in existing_keywords:
+        term = keyword.lower()
+        existing_category = self.search_terms.get(term)
+        if existing_category == category.lower():
             return
+        if existing_category is not None:
+            raise Exception('repeated term in categorization: {}'.format(term))
 
         self.categorization[category].append(keyword)
-        with open(self.filename, 'w') as f:
-            f.write(self.serialize())
-        self.reload()
+        with open(self.journal_filename, 'a') as f:
+            f.write(json.dumps({'category': category, 'keyword': keyword}))
+            f.write('\n')
+        self._journal_length += 1
+        self.search_terms[term] = category.lower()
+        self.keyword_index.add(term)
+        self.description_cache.add_term(term, category.lower())
+        if self._journal_length >= JOURNAL_COMPACT_THRESHOLD:
+            self.compact()
+
+    def match(self, description):
+        """Return the search terms found in `description` and their categories."""
+        cached = self.description_cache.get(description)
+        if cached is not None:
+            category, term = cached
+            return ({term}, {category}) if term else (set(), set())
+
+        found_terms = self.keyword_index.find(description)
+        found_categories = {self.search_terms[t] for t in found_terms}
+        if len(found_categories) == 1:
+            self.description_cache.set(description, next(iter(found_categories)), next(iter(found_terms)))
+        elif not found_categories:
+            self.description_cache.set(description, None, None)
+        return found_terms, found_categories
 
     def get_search_term_dict(self):
         search_term_to_category = {}
@@ -55,11 +146,13 @@ class Config(object):
         return search_term_to_category
 
 
-_config = Config(CONFIG_FILE_NAME)
+_config = Config(CONFIG_FILE_NAME, CONFIG_JOURNAL_FILE_NAME, DESCRIPTION_CACHE_FILE_NAME)
+_results = ResultsCache(RESULTS_FILE_NAME)
 
 
 class Transaction(object):
-    def __init__(self, transaction_date, post_date, description, chase_category, type, amount):
+    def __init__(self, transaction_date, post_date, description, chase_category, type, amount, card=None):
+        self.card = card
         self.transaction_date = transaction_date
         self.post_date = post_date
         self.description = description.lower()
@@ -69,6 +162,20 @@ class Transaction(object):
         self.is_payment = self.amount < 0
         self.our_category = None
 
+    @property
+    def key(self):
+        return '{}|{}|{}'.format(self.transaction_date, self.description, self.amount)
+
+    def to_row(self):
+        return [
+            self.transaction_date,
+            self.post_date,
+            self.description,
+            self.chase_category,
+            self.type,
+            -self.amount,
+        ]
+
     def categorize(self, update_config):
         return self.ask_for_category(
             [c for c in _config.categories if c != PAYMENT_CATEGORY],
@@ -119,29 +226,39 @@ class Transaction(object):
             return False
         return True
 
-    def set_our_category(self, confirm=False, update_config=False):
-        search_terms = _config.search_terms
-        found_terms = set()
+    def set_our_category(self, confirm=False, update_config=False, interactive=True):
         if (self.is_payment):
             self.our_category = PAYMENT_CATEGORY
             return
 
-        for term in search_terms:
-            if term in self.description:
-                found_terms.add(term)
+        cached_category = _results.get(self.key)
+        if cached_category is not None:
+            self.our_category = cached_category
+            return
+
+        found_terms, found_categories = _config.match(self.description)
+        if len(found_categories) == 1 and not confirm:
+            self.our_category = next(iter(found_categories))
+            return
+
+        # Everything past this point needs an answer from the user. Batch mode
+        # leaves the transaction uncategorized for the review pass.
+        if not interactive:
+            self.our_category = None
+            return
 
-        found_categories = {search_terms[t] for t in found_terms}
         if len(found_categories) == 1:
             found_term = next(iter(found_terms))
             found_category = next(iter(found_categories))
-            if not confirm or self.confirm_category(found_category, found_term):
-                self.our_category = search_terms[found_term]
-            else:
-                self.our_category = self.categorize(False)
+            if self.confirm_category(found_category, found_term):
+                self.our_category = found_category
+                return
+            self.our_category = self.categorize(False)
         elif len(found_categories) > 1:
             self.our_category = self.ask_for_category(found_categories, update_config)
         else:
             self.our_category = self.categorize(update_config)
+        _results.add(self.key, self.our_category)
 
 
 def parse_filename(filename):
@@ -160,48 +277,162 @@ def parse_filename(filename):
     }
 
 
+_statement_index = StatementIndex(STATEMENT_INDEX_FILE_NAME, IN_DIR, parse_filename)
+_ledger = FingerprintLedger(FINGERPRINT_LEDGER_FILE_NAME)
+
+
 def load_config():
     return json.load(open(CONFIG_FILE_NAME, 'r'))
 
 
-def load_transactions(transaction_file_name):
-    _transactions = []
-    with open ('{}'.format(transaction_file_name), 'r') as f:
-        f.readline()
-        for line in f:
-            transaction = Transaction(*line.split(','))
-            _transactions.append(transaction)
-    return sorted(_transactions, key=lambda t: t.transaction_date)
+def load_transactions(transaction_file_name, card=None):
+    for row in read_rows(transaction_file_name):
+        yield Transaction(*row, card=card)
+
+
+def add_to_store(store, transaction):
+    store.append(
+        parse_chase_date(transaction.transaction_date),
+        transaction.description,
+        transaction.amount,
+        transaction.our_category,
+        transaction.card,
+    )
+
+
+def ingest_file(filename, card, duplicates=frozenset()):
+    """Parse and categorize one export without prompting.
+
+    Rows whose fingerprint is in `duplicates` are skipped. Returns a store of
+    the transactions the keywords and results cache could categorize, the
+    transactions that still need an answer, and the description cache hits
+    and misses along the way.
+    """
+    description_cache = _config.description_cache
+    hits, misses = description_cache.hits, description_cache.misses
+    store = TransactionStore()
+    unresolved = []
+    for fingerprint, row in fingerprint_rows(read_rows(filename)):
+        if fingerprint in duplicates:
+            continue
+        transaction = Transaction(*row, card=card)
+        transaction.set_our_category(confirm=False, interactive=False)
+        if transaction.our_category is None:
+            unresolved.append(transaction)
+        else:
+            add_to_store(store, transaction)
+    description_cache.flush()
+    return store, unresolved, (description_cache.hits - hits, description_cache.misses - misses)
 
 
-def do_work(filename):
-    transactions = load_transactions(filename)
+def find_duplicates(filenames):
+    """Return the fingerprints of the rows each input repeats from an earlier one.
+
+    Inputs that overlap an earlier one are reported along the way.
+    """
+    duplicates, overlaps = _ledger.find_duplicates(
+        [
+            (f, _statement_index.card(f), _statement_index.content_hash(f), os.path.join(IN_DIR, f))
+            for f in filenames
+        ]
+    )
+    for f in filenames:
+        if overlaps[f]:
+            print('{}: {} of {} rows already in {}'.format(
+                f,
+                len(duplicates[f]),
+                _statement_index.rows(f),
+                ', '.join('{} ({})'.format(other, count) for other, count in overlaps[f].items()),
+            ))
+    return duplicates
+
+
+def ingest_files(filenames, jobs=None, duplicates=None):
+    """Run `ingest_file` over every file, in parallel when there is more than one.
+
+    `duplicates` maps input names to the fingerprints of the rows to skip, as
+    returned by `find_duplicates`. Results come back in the same order as
+    `filenames`.
+    """
+    names = [os.path.basename(f) for f in filenames]
+    cards = [parse_filename(name)['card'] for name in names]
+    skipped = [(duplicates or {}).get(name, frozenset()) for name in names]
+    if jobs == 1 or len(filenames) < 2:
+        return [ingest_file(f, card, skip) for f, card, skip in zip(filenames, cards, skipped)]
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        ingested = list(executor.map(ingest_file, filenames, cards, skipped))
+
+    # Each worker counted its own description cache lookups.
+    for _, _, (hits, misses) in ingested:
+        _config.description_cache.hits += hits
+        _config.description_cache.misses += misses
+    return ingested
+
+
+def merge_ingested(ingested):
+    store = merge_stores([store for store, _, _ in ingested])
+    unresolved = sorted(
+        [t for _, file_unresolved, _ in ingested for t in file_unresolved],
+        key=lambda t: parse_chase_date(t.transaction_date),
+    )
+    return store, unresolved
+
+
+def do_work(store, transactions):
     total = len(transactions)
     for i, transaction in enumerate(transactions, start=1):
-        print('\n{}/{}'.format(i, total))
+        print('\n{}/{} ({})'.format(i, total, transaction.card))
         transaction.set_our_category(confirm=False, update_config=True)
-    return transactions
+        add_to_store(store, transaction)
+    _config.description_cache.flush()
 
 
-def get_filenames(indir):
-    chase_inputs = sorted(
-        [f for f in os.listdir(indir) if os.path.isfile(os.path.join(indir, f)) and parse_filename(f)],
-        key=lambda fn: parse_filename(fn)['start_date']
-    )
-    filename_to_parsed = {f: parse_filename(f) for f in chase_inputs}
+def print_cache_stats():
+    description_cache = _config.description_cache
+    print('\nCategorization cache: {} hits, {} misses'.format(description_cache.hits, description_cache.misses))
+
+
+def write_review_queue(transactions):
+    with open(REVIEW_QUEUE_FILE_NAME, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Transaction Date', 'Post Date', 'Description', 'Category', 'Type', 'Amount'])
+        for transaction in transactions:
+            writer.writerow(transaction.to_row())
+
+
+def get_chase_inputs(period=None):
+    """Return the exports in IN_DIR, ordered by start date.
+
+    `period` is an optional `(start, end)` range; only statements overlapping
+    it are returned.
+    """
+    start, end = period or (None, None)
+    return _statement_index.refresh().statements(start, end)
+
+
+def get_filenames(period=None):
+    chase_inputs = get_chase_inputs(period)
     for i, ci in enumerate(chase_inputs, start=1):
-        filename_to_parsed[ci]['index'] = i
-        print('({index}): {card} | {start} - {end}'.format(
-            index=filename_to_parsed[ci]['index'],
-            card=filename_to_parsed[ci]['card'],
-            start=filename_to_parsed[ci]['start_date'].strftime(DATE_FORMAT),
-            end=filename_to_parsed[ci]['end_date'].strftime(DATE_FORMAT),
+        print('({index}): {card} | {start} - {end} | {rows} rows'.format(
+            index=i,
+            card=_statement_index.card(ci),
+            start=_statement_index.start_date(ci).strftime(DATE_FORMAT),
+            end=_statement_index.end_date(ci).strftime(DATE_FORMAT),
+            rows=_statement_index.rows(ci),
         ))
     indexes = input('\nSelect files (space separated): ')
     indexes = [int(i)-1 for i in indexes.split(' ')]
     return [chase_inputs[i] for i in indexes]
 
 
+def group_by_period(filenames):
+    filenames_by_period = defaultdict(list)
+    for filename in filenames:
+        period = (_statement_index.start_date(filename), _statement_index.end_date(filename))
+        filenames_by_period[period].append(filename)
+    return filenames_by_period
+
+
 def validate_file_dates(parsed_filenames):
     start_dates = set([pf['start_date'] for pf in parsed_filenames])
     end_dates = set([pf['end_date'] for pf in parsed_filenames])
@@ -209,35 +440,18 @@ def validate_file_dates(parsed_filenames):
     assert len(set(end_dates)) == 1, 'multiple end_dates: {}'.format(end_dates)
 
 
-def run():
-    all_transactions = []
-    filenames = get_filenames(IN_DIR)
-    parsed_filename_by_filename = {
-        os.path.basename(f): parse_filename(os.path.basename(f)) for f in filenames
-    }
-    validate_file_dates(parsed_filename_by_filename.values())
+def get_output_filename(parsed_filename):
+    return '{start}-{end}.csv'.format(
+        start=parsed_filename['formatted_start_date'].replace(' ', '_'),
+        end=parsed_filename['formatted_end_date'].replace(' ', '_'),
+    )
 
-    output_filename = None
-    for filename in filenames:
-        filename = os.path.join(IN_DIR, filename)
-        parsed_filename = parsed_filename_by_filename[os.path.basename(filename)]
-        if output_filename is None:
-            output_filename = '{start}-{end}.csv'.format(
-                start=parsed_filename['formatted_start_date'].replace(' ', '_'),
-                end=parsed_filename['formatted_end_date'].replace(' ', '_'),
-            )
-        print(" == {} ==".format(parsed_filename['card']))
-        all_transactions.extend(do_work(filename))
-
-    total_total = 0
-    transactions_by_category = {c: [] for c in _config.categories}
-    total_by_category = {c: 0 for c in _config.categories}
-    for transaction in sorted(all_transactions, key=lambda t: t.transaction_date):
-        transactions_by_category[transaction.our_category].append(transaction)
-        total_by_category[transaction.our_category] += transaction.amount
-        total_total += 0 if transaction.is_payment else transaction.amount
 
-    summary_parsed = parsed_filename_by_filename[next(iter(parsed_filename_by_filename.keys()))]
+def write_output(store, summary_parsed, output_filename, pivots=False):
+    report = Report(store, _config.categories)
+    total_by_category = dict(zip(_config.categories, report.totals_by_category().tolist()))
+    total_total = report.total().item()
+
     summary_line_headers = ['Date']
     summary_line_values = ['{}-{}'.format(summary_parsed['start_date'].year, summary_parsed['start_date'].year)]
     for category in [c for c in _config.categories if c != PAYMENT_CATEGORY]:
@@ -248,32 +462,197 @@ def run():
     summary_line_headers.append('Total Shared')
     summary_line_values.append(round(total_total - sum(total_by_category[cat] for cat in _config.unshared_categories), 2))
 
+    # Build the whole file in memory and write it once.
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(['transaction_date', 'description', 'amount', 'category'])
+    for category, rows in report.listing():
+        writer.writerows(rows)
+        buffer.write('\n')
+
+    buffer.write('\n')
+    writer.writerows([category, round(total_by_category[category], 2)] for category in _config.categories)
+
+    buffer.write('\n')
+    writer.writerow(summary_line_headers)
+    writer.writerow(summary_line_values)
+
     with open('{}/{}'.format(OUT_DIR, output_filename), 'w') as f:
-        f.write('{},{},{},{}\n'.format(
-            'transaction_date',
-            'description',
-            'amount',
-            'category',
-        ))
-        for category in _config.categories:
-            for transaction in transactions_by_category[category]:
-                f.write('{},{},{},{}\n'.format(
-                    transaction.transaction_date,
-                    transaction.description,
-                    transaction.amount,
-                    category,
-                ))
-            f.write('\n')
+        f.write(buffer.getvalue())
+
+    if pivots:
+        stem = os.path.splitext(output_filename)[0]
+        for name, pivot in (('month', report.by_month()), ('card', report.by_card())):
+            with open('{}/{}_by_{}.csv'.format(OUT_DIR, stem, name), 'w') as f:
+                f.write(pivot_csv(name, _config.categories, *pivot))
+
+
+def run(jobs=None, pivots=False, period=None):
+    filenames = get_filenames(period)
+    parsed_filename_by_filename = {
+        os.path.basename(f): parse_filename(os.path.basename(f)) for f in filenames
+    }
+    validate_file_dates(parsed_filename_by_filename.values())
 
-        f.write('\n')
-        for category in _config.categories:
-            f.write('{},{}\n'.format(category, round(total_by_category[category], 2)))
+    duplicates = find_duplicates(filenames)
+    ingested = ingest_files([os.path.join(IN_DIR, f) for f in filenames], jobs, duplicates)
+    store, unresolved = merge_ingested(ingested)
+    do_work(store, unresolved)
+
+    summary_parsed = parsed_filename_by_filename[next(iter(parsed_filename_by_filename.keys()))]
+    write_output(store, summary_parsed, get_output_filename(summary_parsed), pivots)
+    print_cache_stats()
+
+
+def run_batch(jobs=None, pivots=False, period=None):
+    filenames = get_chase_inputs(period)
+    duplicates = find_duplicates(filenames)
+    ingested_by_filename = dict(zip(
+        filenames,
+        ingest_files([os.path.join(IN_DIR, f) for f in filenames], jobs, duplicates),
+    ))
+
+    filenames_by_period = group_by_period(filenames)
+
+    unresolved = []
+    for filenames in filenames_by_period.values():
+        summary_parsed = parse_filename(filenames[0])
+        output_filename = get_output_filename(summary_parsed)
+        store, period_unresolved = merge_ingested([ingested_by_filename[f] for f in filenames])
+
+        if period_unresolved:
+            print('{}: {} of {} transactions need review'.format(
+                output_filename,
+                len(period_unresolved),
+                len(store) + len(period_unresolved),
+            ))
+            unresolved.extend(period_unresolved)
+        else:
+            print('{}: all {} transactions categorized'.format(output_filename, len(store)))
+            write_output(store, summary_parsed, output_filename, pivots)
+
+    if not unresolved:
+        if os.path.exists(REVIEW_QUEUE_FILE_NAME):
+            os.remove(REVIEW_QUEUE_FILE_NAME)
+    else:
+        write_review_queue(unresolved)
+        print('\n{} transactions written to {}, categorize them with --review'.format(
+            len(unresolved),
+            REVIEW_QUEUE_FILE_NAME,
+        ))
+    print_cache_stats()
+
+
+def write_rollup(summary_by_period):
+    categories = [c for c in _config.categories if c != PAYMENT_CATEGORY]
+    summary_by_year = defaultdict(list)
+    for (start_date, _), summary in summary_by_period.items():
+        summary_by_year[start_date.year].append(summary)
+
+    def summary_row(label, summary):
+        totals = summary['categories']
+        return [label] + [round(totals.get(c, 0), 2) for c in categories] + [round(summary['total'], 2)]
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(['period'] + categories + ['Total'])
+    for (start_date, end_date), summary in sorted(summary_by_period.items()):
+        label = '{}-{}'.format(start_date.strftime(DATE_FORMAT), end_date.strftime(DATE_FORMAT))
+        writer.writerow(summary_row(label, summary))
+
+    buffer.write('\n')
+    writer.writerow(['year'] + categories + ['Total'])
+    for year, summaries in sorted(summary_by_year.items()):
+        writer.writerow(summary_row(year, merge_summaries(summaries)))
+
+    with open('{}/{}'.format(OUT_DIR, ROLLUP_FILE_NAME), 'w') as f:
+        f.write(buffer.getvalue())
+
+
+def run_rollup(jobs=None, rebuild=False, period=None):
+    """Summarize every statement period and roll them up by period and year.
+
+    Each period's summary is saved under PERIODS_DIR and reused until the
+    content of one of its input files changes, or a keyword or answer that
+    could recategorize its rows does, so only new statements are read.
+    """
+    os.makedirs(PERIODS_DIR, exist_ok=True)
+    filenames = get_chase_inputs(period)
+    # Overlap is found across every statement, not just the stale ones, so a
+    # cached period and a recomputed one never both count the same row.
+    duplicates = find_duplicates(filenames)
+    filenames_by_period = group_by_period(filenames)
+    categorization = '{}:{}'.format(_config.description_cache.fingerprint, _results.fingerprint)
+
+    summary_by_period = {}
+    stale = {}
+    for period, filenames in filenames_by_period.items():
+        sources = {
+            'statements': {f: [_statement_index.content_hash(f), len(duplicates[f])] for f in filenames},
+            'categorization': categorization,
+        }
+        artifact_filename = os.path.join(PERIODS_DIR, get_output_filename(parse_filename(filenames[0])).replace('.csv', '.json'))
+        summary = None if rebuild else load_summary(artifact_filename, sources)
+        if summary is None:
+            stale[period] = (artifact_filename, sources)
+        else:
+            summary_by_period[period] = summary
+    print('{} periods cached, {} to process'.format(len(summary_by_period), len(stale)))
+
+    stale_filenames = [f for period in stale for f in filenames_by_period[period]]
+    ingested_by_filename = dict(zip(
+        stale_filenames,
+        ingest_files([os.path.join(IN_DIR, f) for f in stale_filenames], jobs, duplicates),
+    ))
+    for period, (artifact_filename, sources) in stale.items():
+        store, unresolved = merge_ingested([ingested_by_filename[f] for f in filenames_by_period[period]])
+        if unresolved:
+            print('{}: {} transactions need review, skipping (run --batch and --review first)'.format(
+                os.path.basename(artifact_filename),
+                len(unresolved),
+            ))
+            continue
+        summary = summarize(Report(store, _config.categories))
+        save_summary(artifact_filename, sources, summary)
+        summary_by_period[period] = summary
+
+    write_rollup(summary_by_period)
+    print('Rolled up {} periods into {}/{}'.format(len(summary_by_period), OUT_DIR, ROLLUP_FILE_NAME))
+    print_cache_stats()
+
+
+def run_review():
+    if not os.path.exists(REVIEW_QUEUE_FILE_NAME):
+        print('Nothing to review, run with --batch first')
+        return
+
+    # Answers go to the shared results cache, so the next --batch run picks
+    # them up without prompting again.
+    for transaction in load_transactions(REVIEW_QUEUE_FILE_NAME):
+        transaction.set_our_category(confirm=False, update_config=True)
+    _config.description_cache.flush()
+    os.remove(REVIEW_QUEUE_FILE_NAME)
+    print('\nReview complete, run with --batch again to write the outputs')
 
-        f.write('\n')
-        f.write(','.join([str(h) for h in summary_line_headers]))
-        f.write('\n')
-        f.write(','.join([str(v) for v in summary_line_values]))
-        f.write('\n')
 
 if __name__ == '__main__':
-    run()
+    parser = argparse.ArgumentParser()
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--batch', action='store_true', help='categorize every input without prompting and queue the rest for review')
+    mode.add_argument('--review', action='store_true', help='prompt for the transactions queued by --batch')
+    mode.add_argument('--rollup', action='store_true', help='summarize every statement period by period and year')
+    parser.add_argument('--jobs', type=int, help='processes used to read the input files, defaults to one per CPU')
+    parser.add_argument('--pivots', action='store_true', help='also write month-by-category and card-by-category reports')
+    parser.add_argument('--rebuild', action='store_true', help='with --rollup, ignore the saved period summaries')
+    parser.add_argument('--period', type=parse_period, help='only use statements overlapping 2024, 2024-Q3 or 2024-07')
+    args = parser.parse_args()
+
+    atexit.register(_config.compact)
+    if args.batch:
+        run_batch(args.jobs, args.pivots, args.period)
+    elif args.review:
+        run_review()
+    elif args.rollup:
+        run_rollup(args.jobs, args.rebuild, args.period)
+    else:
+        run(args.jobs, args.pivots, args.period)
@@ -0,0 +1,82 @@
+from collections import Counter, defaultdict
+import hashlib
+import json
+import os
+
+from description_cache import normalize_description
+from store import read_rows
+
+
+def fingerprint_rows(rows):
+    """Yield `(fingerprint, row)` for each row of a Chase export.
+
+    The fingerprint hashes the date, amount and normalized description plus
+    how many identical rows came before it in the same file, so two real
+    coffees on the same day stay distinct while a second download of the
+    same statement collides with the first.
+    """
+    occurrences = defaultdict(int)
+    for row in rows:
+        key = '{}|{:.2f}|{}'.format(row[0], float(row[5]), normalize_description(row[2]))
+        occurrence = occurrences[key]
+        occurrences[key] += 1
+        digest = hashlib.blake2b('{}|{}'.format(key, occurrence).encode('utf-8'), digest_size=8).digest()
+        yield int.from_bytes(digest, 'big'), row
+
+
+class FingerprintLedger(object):
+    """Row fingerprints of every export seen so far, keyed by content hash.
+
+    An export is only read to fingerprint it the first time its contents are
+    seen; after that the fingerprints come from the ledger, so finding the
+    overlap between a large archive of statements touches no file contents.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.fingerprints_by_hash = {}
+        self._changed = False
+        if os.path.exists(filename):
+            with open(filename, 'r') as f:
+                self.fingerprints_by_hash = json.load(f)
+
+    def fingerprints(self, content_hash, path):
+        fingerprints = self.fingerprints_by_hash.get(content_hash)
+        if fingerprints is None:
+            fingerprints = [fingerprint for fingerprint, _ in fingerprint_rows(read_rows(path))]
+            self.fingerprints_by_hash[content_hash] = fingerprints
+            self._changed = True
+        return fingerprints
+
+    def save(self):
+        if not self._changed:
+            return
+        temp_filename = '{}.tmp'.format(self.filename)
+        with open(temp_filename, 'w') as f:
+            json.dump(self.fingerprints_by_hash, f)
+        os.replace(temp_filename, self.filename)
+        self._changed = False
+
+    def find_duplicates(self, statements):
+        """Return the duplicate fingerprints of each statement, and the overlap between them.
+
+        `statements` is an ordered list of `(name, card, content_hash, path)`.
+        A row is a duplicate when an earlier statement for the same card
+        already has it; the overlap maps each name to a Counter of the earlier
+        statements it repeats.
+        """
+        owner_by_fingerprint = {}
+        duplicates = {}
+        overlaps = {}
+        for name, card, content_hash, path in statements:
+            file_duplicates = set()
+            file_overlaps = Counter()
+            for fingerprint in self.fingerprints(content_hash, path):
+                owner = owner_by_fingerprint.setdefault((card, fingerprint), name)
+                if owner != name:
+                    file_duplicates.add(fingerprint)
+                    file_overlaps[owner] += 1
+            duplicates[name] = file_duplicates
+            overlaps[name] = file_overlaps
+        self.save()
+        return duplicates, overlaps
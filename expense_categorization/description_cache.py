@@ -0,0 +1,113 @@
+import hashlib
+import os
+import sqlite3
+
+FINGERPRINT_KEY = 'keywords_fingerprint'
+
+
+def normalize_description(description):
+    return description.lower().strip()
+
+
+def term_fingerprint(term, category):
+    digest = hashlib.blake2b('{}\0{}'.format(term, category).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+class DescriptionCache(object):
+    """On-disk memo of keyword matching, keyed by normalized description.
+
+    Each entry is the category the search terms resolved a description to and
+    the term that matched, or neither when no term matched. Descriptions that
+    match terms from several categories are never cached since they always
+    need an answer from the user.
+
+    The cache is tied to the keyword set through an order independent
+    fingerprint, so editing config.json by hand clears it. `add_term` only
+    drops the entries the new term could change: those whose description
+    contains it.
+    """
+
+    def __init__(self, filename, search_terms):
+        self.filename = filename
+        self.hits = 0
+        self.misses = 0
+        self._fingerprint = 0
+        for term, category in search_terms.items():
+            self._fingerprint ^= term_fingerprint(term, category)
+        self._pending = {}
+        self._connection = None
+        self._pid = None
+
+    def _connect(self):
+        # sqlite connections can't be shared across a fork, so each ingestion
+        # worker opens its own.
+        if self._connection is not None and self._pid == os.getpid():
+            return self._connection
+
+        self._pending = {}
+        self._pid = os.getpid()
+        self._connection = sqlite3.connect(self.filename, timeout=30)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS matches (description TEXT PRIMARY KEY, category TEXT, term TEXT)'
+        )
+        row = self._connection.execute('SELECT value FROM meta WHERE key = ?', (FINGERPRINT_KEY,)).fetchone()
+        if row is None or row[0] != self._fingerprint_value():
+            self._connection.execute('DELETE FROM matches')
+            self._store_fingerprint()
+        self._connection.commit()
+        return self._connection
+
+    @property
+    def fingerprint(self):
+        """The keyword set's fingerprint, as stored alongside the cache."""
+        return self._fingerprint_value()
+
+    def _fingerprint_value(self):
+        return '{:016x}'.format(self._fingerprint)
+
+    def _store_fingerprint(self):
+        self._connection.execute(
+            'INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+            (FINGERPRINT_KEY, self._fingerprint_value()),
+        )
+
+    def get(self, description):
+        """Return `(category, term)` for a cached description, or None on a miss."""
+        description = normalize_description(description)
+        match = self._pending.get(description)
+        if match is None:
+            match = self._connect().execute(
+                'SELECT category, term FROM matches WHERE description = ?',
+                (description,),
+            ).fetchone()
+        if match is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return match
+
+    def set(self, description, category, term):
+        self._connect()
+        self._pending[normalize_description(description)] = (category, term)
+
+    def flush(self):
+        if not self._pending:
+            return
+        connection = self._connect()
+        connection.executemany(
+            'INSERT OR REPLACE INTO matches (description, category, term) VALUES (?, ?, ?)',
+            [(description, category, term) for description, (category, term) in self._pending.items()],
+        )
+        connection.commit()
+        self._pending = {}
+
+    def add_term(self, term, category):
+        connection = self._connect()
+        self._pending = {d: m for d, m in self._pending.items() if term not in d}
+        connection.execute('DELETE FROM matches WHERE instr(description, ?) > 0', (term,))
+        self._fingerprint ^= term_fingerprint(term, category)
+        self._store_fingerprint()
+        connection.commit()
@@ -0,0 +1,112 @@
+from collections import deque
+
+# Terms added after the automaton is built are checked with a plain substring
+# test until this many have accumulated, then folded in with one rebuild.
+PENDING_TERM_LIMIT = 64
+
+
+class KeywordIndex(object):
+    """Aho-Corasick automaton over the categorization search terms.
+
+    `find` returns every term that occurs in a description with a single pass
+    over its characters, regardless of how many terms are indexed. Adding a
+    term does not touch the automaton: it joins a short pending list that
+    `find` checks by substring test. Once the list reaches PENDING_TERM_LIMIT
+    it is folded in with one full rebuild of the failure links, so adds are
+    cheap on average but not O(1), and every PENDING_TERM_LIMIT-th add pays
+    for a rebuild.
+    """
+
+    def __init__(self, terms=()):
+        # Node 0 is the root. Each node has a goto table, a failure link and
+        # the terms that end at (or are suffixes of the path to) the node.
+        self._goto = [{}]
+        self._fail = [0]
+        self._terms = [()]
+        self._own_terms = [()]
+        self._pending = []
+        self._count = 0
+        for term in terms:
+            self._insert(term)
+        self._build()
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, term):
+        if term in self._pending:
+            return True
+        node = self._walk(term)
+        return node is not None and term in self._own_terms[node]
+
+    def _walk(self, term):
+        node = 0
+        for char in term:
+            node = self._goto[node].get(char)
+            if node is None:
+                return None
+        return node
+
+    def add(self, term):
+        if not term or term in self:
+            return
+        self._pending.append(term)
+        self._count += 1
+        if len(self._pending) >= PENDING_TERM_LIMIT:
+            pending, self._pending = self._pending, []
+            self._count -= len(pending)
+            for pending_term in pending:
+                self._insert(pending_term)
+            self._build()
+
+    def _insert(self, term):
+        if not term or term in self:
+            return
+        node = 0
+        for char in term:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._terms.append(())
+                self._own_terms.append(())
+                self._goto[node][char] = next_node
+            node = next_node
+        self._own_terms[node] = self._own_terms[node] + (term,)
+        self._count += 1
+
+    def _build(self):
+        queue = deque()
+        for child in self._goto[0].values():
+            self._fail[child] = 0
+            self._terms[child] = self._own_terms[child]
+            queue.append(child)
+
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                self._fail[child] = fail
+                self._terms[child] = self._own_terms[child] + self._terms[fail]
+                queue.append(child)
+
+    def find(self, text):
+        goto = self._goto
+        fail = self._fail
+        terms = self._terms
+        found = set()
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if terms[node]:
+                found.update(terms[node])
+        for term in self._pending:
+            if term in text:
+                found.add(term)
+        return found
@@ -0,0 +1,102 @@
+import csv
+from datetime import date
+import io
+
+import numpy as np
+
+from store import format_chase_date
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+class Report(object):
+    """Vectorized aggregates over a TransactionStore.
+
+    Every grouping (category, month, card) is mapped to a dense integer code
+    and reduced with `np.bincount`, so the cost is a few passes over the
+    store's arrays regardless of how many transactions there are.
+    """
+
+    def __init__(self, store, categories):
+        self.categories = list(categories)
+        category_codes = {c: i for i, c in enumerate(self.categories)}
+        category_lookup = np.array(
+            [category_codes[c] for c in store.categories.values],
+            dtype=np.intp,
+        )
+
+        self.store = store
+        self.dates = np.asarray(store.dates)
+        self.amounts = np.asarray(store.amounts)
+        self.category_codes = category_lookup[np.asarray(store.category_ids, dtype=np.intp)]
+        self.cards = store.cards.values
+        self.card_codes = np.asarray(store.card_ids, dtype=np.intp)
+
+        months = (self.dates - EPOCH_ORDINAL).astype('datetime64[D]').astype('datetime64[M]')
+        self.months, self.month_codes = np.unique(months, return_inverse=True)
+
+    def totals_by_category(self):
+        return np.bincount(self.category_codes, weights=self.amounts, minlength=len(self.categories))
+
+    def total(self):
+        # Payments are negative and don't count towards spending.
+        return self.amounts[self.amounts >= 0].sum()
+
+    def totals(self, codes, size):
+        spending = np.where(self.amounts >= 0, self.amounts, 0)
+        return np.bincount(codes, weights=spending, minlength=size)
+
+    def pivot(self, codes, size):
+        """Sum amounts into a `size` x categories matrix, one row per code."""
+        category_count = len(self.categories)
+        flat = np.bincount(
+            codes * category_count + self.category_codes,
+            weights=self.amounts,
+            minlength=size * category_count,
+        )
+        return flat.reshape(size, category_count)
+
+    def by_month(self):
+        """Return month labels, the month x category matrix and each month's total."""
+        size = len(self.months)
+        return (
+            [str(m) for m in self.months],
+            self.pivot(self.month_codes, size),
+            self.totals(self.month_codes, size),
+        )
+
+    def by_card(self):
+        """Return card labels, the card x category matrix and each card's total."""
+        size = len(self.cards)
+        return (
+            list(self.cards),
+            self.pivot(self.card_codes, size),
+            self.totals(self.card_codes, size),
+        )
+
+    def listing(self):
+        """Yield `(category, rows)` with each category's rows in date order."""
+        order = np.lexsort((self.dates, self.category_codes))
+        bounds = np.searchsorted(self.category_codes[order], np.arange(len(self.categories) + 1))
+        # Format each distinct date once rather than once per row.
+        unique_dates, date_codes = np.unique(self.dates[order], return_inverse=True)
+        formatted_dates = [format_chase_date(d) for d in unique_dates.tolist()]
+        dates = [formatted_dates[c] for c in date_codes.tolist()]
+        amounts = self.amounts[order].tolist()
+        description_ids = np.asarray(self.store.description_ids)[order].tolist()
+        descriptions = self.store.descriptions.values
+        for code, category in enumerate(self.categories):
+            start, end = bounds[code], bounds[code + 1]
+            yield category, [
+                (dates[i], descriptions[description_ids[i]], amounts[i], category)
+                for i in range(start, end)
+            ]
+
+
+def pivot_csv(row_header, categories, labels, matrix, totals):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow([row_header] + list(categories) + ['Total'])
+    for label, row, total in zip(labels, np.round(matrix, 2).tolist(), np.round(totals, 2).tolist()):
+        writer.writerow([label] + row + [total])
+    return buffer.getvalue()
@@ -0,0 +1,62 @@
+import hashlib
+import json
+import os
+
+
+def entry_fingerprint(key, category):
+    digest = hashlib.blake2b('{}\0{}'.format(key, category).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+class ResultsCache(object):
+    """Categories chosen by hand, keyed by transaction.
+
+    Shared by the interactive, `--batch` and `--review` passes so a transaction
+    is only ever prompted for once. Stored as an append-only file of JSON lines
+    so that recording an answer never rewrites the earlier ones.
+
+    Like the description cache, the answers have an order independent
+    fingerprint, so anything derived from them can tell when one changed.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._categories = {}
+        self._fingerprint = 0
+        self.reload()
+
+    def __len__(self):
+        return len(self._categories)
+
+    @property
+    def fingerprint(self):
+        return '{:016x}'.format(self._fingerprint)
+
+    def reload(self):
+        self._categories = {}
+        self._fingerprint = 0
+        if not os.path.exists(self.filename):
+            return
+        with open(self.filename, 'r') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                self._set(entry['key'], entry['category'])
+
+    def _set(self, key, category):
+        if key in self._categories:
+            self._fingerprint ^= entry_fingerprint(key, self._categories[key])
+        self._categories[key] = category
+        self._fingerprint ^= entry_fingerprint(key, category)
+
+    def get(self, key):
+        return self._categories.get(key)
+
+    def add(self, key, category):
+        if self._categories.get(key) == category:
+            return
+        self._set(key, category)
+        with open(self.filename, 'a') as f:
+            f.write(json.dumps({'key': key, 'category': category}))
+            f.write('\n')
@@ -0,0 +1,64 @@
+from collections import defaultdict
+import json
+import os
+
+
+def summarize(report):
+    """Reduce a period's Report to the totals a rollup needs."""
+    categories = report.categories
+    months, month_matrix, _ = report.by_month()
+    cards, card_matrix, _ = report.by_card()
+    return {
+        'categories': dict(zip(categories, report.totals_by_category().tolist())),
+        'total': report.total().item(),
+        'months': {m: dict(zip(categories, row)) for m, row in zip(months, month_matrix.tolist())},
+        'cards': {c: dict(zip(categories, row)) for c, row in zip(cards, card_matrix.tolist())},
+    }
+
+
+def load_summary(filename, sources):
+    """Return the summary saved in `filename`, or None if it is missing or stale.
+
+    `sources` holds each input file's content hash and duplicate row count,
+    and the fingerprint of the keywords and answers that categorized its rows;
+    any difference from the saved ones means the period has to be recomputed.
+    """
+    if not os.path.exists(filename):
+        return None
+    with open(filename, 'r') as f:
+        artifact = json.load(f)
+    if artifact['sources'] != sources:
+        return None
+    return artifact['summary']
+
+
+def save_summary(filename, sources, summary):
+    temp_filename = '{}.tmp'.format(filename)
+    with open(temp_filename, 'w') as f:
+        json.dump({'sources': sources, 'summary': summary}, f, indent=4, sort_keys=True)
+    os.replace(temp_filename, filename)
+
+
+def _add_totals(into, totals):
+    for category, amount in totals.items():
+        into[category] += amount
+
+
+def merge_summaries(summaries):
+    categories = defaultdict(float)
+    months = defaultdict(lambda: defaultdict(float))
+    cards = defaultdict(lambda: defaultdict(float))
+    total = 0
+    for summary in summaries:
+        _add_totals(categories, summary['categories'])
+        for month, totals in summary['months'].items():
+            _add_totals(months[month], totals)
+        for card, totals in summary['cards'].items():
+            _add_totals(cards[card], totals)
+        total += summary['total']
+    return {
+        'categories': dict(categories),
+        'total': total,
+        'months': {m: dict(t) for m, t in months.items()},
+        'cards': {c: dict(t) for c, t in cards.items()},
+    }
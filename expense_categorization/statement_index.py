@@ -0,0 +1,128 @@
+import calendar
+import csv
+from datetime import date
+import hashlib
+import io
+import json
+import os
+import re
+
+PERIOD_REGEX = re.compile(r'^(?P<year>\d{4})(?:-(?:Q(?P<quarter>[1-4])|(?P<month>\d{2})))?$')
+
+
+def parse_period(spec):
+    """Turn `2024`, `2024-Q3` or `2024-07` into an inclusive `(start, end)` date range."""
+    match = PERIOD_REGEX.match(spec)
+    if not match:
+        raise ValueError('period must look like 2024, 2024-Q3 or 2024-07, not {}'.format(spec))
+    year = int(match.group('year'))
+    if match.group('quarter'):
+        first_month = (int(match.group('quarter')) - 1) * 3 + 1
+        last_month = first_month + 2
+    elif match.group('month'):
+        first_month = last_month = int(match.group('month'))
+    else:
+        first_month, last_month = 1, 12
+    return date(year, first_month, 1), date(year, last_month, calendar.monthrange(year, last_month)[1])
+
+
+class StatementIndex(object):
+    """Persistent index of the Chase exports in a directory.
+
+    For every export it keeps the card, statement dates, row count, content
+    hash, size and mtime. `refresh` walks the directory with `os.scandir` and
+    only parses the name and reads the contents of files whose size or mtime
+    changed, so listing and querying a large archive touches no file contents.
+    Files that aren't Chase exports are remembered too, so their names aren't
+    matched again either.
+    """
+
+    def __init__(self, filename, directory, parse_filename):
+        self.filename = filename
+        self.directory = directory
+        self.parse_filename = parse_filename
+        self.entries = {}
+        if os.path.exists(filename):
+            with open(filename, 'r') as f:
+                self.entries = json.load(f)
+
+    def _index_entry(self, dir_entry, stat):
+        entry = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+        parsed = self.parse_filename(dir_entry.name)
+        if not parsed:
+            return entry
+
+        with open(dir_entry.path, 'rb') as f:
+            contents = f.read()
+        reader = csv.reader(io.StringIO(contents.decode('utf-8')))
+        next(reader, None)
+        entry.update({
+            'card': parsed['card'],
+            'start_date': parsed['start_date'].toordinal(),
+            'end_date': parsed['end_date'].toordinal(),
+            'rows': sum(1 for row in reader if row),
+            'hash': hashlib.blake2b(contents, digest_size=16).hexdigest(),
+        })
+        return entry
+
+    def refresh(self):
+        entries = {}
+        changed = False
+        with os.scandir(self.directory) as dir_entries:
+            for dir_entry in dir_entries:
+                if not dir_entry.is_file():
+                    continue
+                stat = dir_entry.stat()
+                entry = self.entries.get(dir_entry.name)
+                if entry is None or entry['size'] != stat.st_size or entry['mtime_ns'] != stat.st_mtime_ns:
+                    entry = self._index_entry(dir_entry, stat)
+                    changed = True
+                entries[dir_entry.name] = entry
+
+        changed = changed or entries.keys() != self.entries.keys()
+        self.entries = entries
+        if changed:
+            self.save()
+        return self
+
+    def save(self):
+        temp_filename = '{}.tmp'.format(self.filename)
+        with open(temp_filename, 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(temp_filename, self.filename)
+
+    def statements(self, start=None, end=None, cards=None):
+        """Return the exports overlapping `start`..`end`, ordered by start date.
+
+        `start` and `end` are dates and either can be None for an open range;
+        `cards` optionally limits the result to some cards.
+        """
+        start = start.toordinal() if start else None
+        end = end.toordinal() if end else None
+        found = []
+        for name, entry in self.entries.items():
+            if 'card' not in entry:
+                continue
+            if start is not None and entry['end_date'] < start:
+                continue
+            if end is not None and entry['start_date'] > end:
+                continue
+            if cards is not None and entry['card'] not in cards:
+                continue
+            found.append(name)
+        return sorted(found, key=lambda name: (self.entries[name]['start_date'], name))
+
+    def card(self, name):
+        return self.entries[name]['card']
+
+    def start_date(self, name):
+        return date.fromordinal(self.entries[name]['start_date'])
+
+    def end_date(self, name):
+        return date.fromordinal(self.entries[name]['end_date'])
+
+    def rows(self, name):
+        return self.entries[name]['rows']
+
+    def content_hash(self, name):
+        return self.entries[name]['hash']
@@ -0,0 +1,110 @@
+from array import array
+import csv
+from datetime import date, datetime
+import heapq
+import sys
+
+CHASE_DATE_FORMAT = '%m/%d/%Y'
+CHASE_COLUMN_COUNT = 6
+
+
+def read_rows(filename):
+    """Yield the fields of each transaction in a Chase export, one row at a time.
+
+    Newer exports add a trailing Memo column, which is dropped.
+    """
+    with open(filename, 'r', newline='') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for row in reader:
+            if row:
+                yield row[:CHASE_COLUMN_COUNT]
+
+
+def parse_chase_date(value):
+    return datetime.strptime(value, CHASE_DATE_FORMAT).date().toordinal()
+
+
+def format_chase_date(ordinal):
+    return date.fromordinal(ordinal).strftime(CHASE_DATE_FORMAT)
+
+
+class StringTable(object):
+    """Interns strings and hands out a small integer id for each one."""
+
+    def __init__(self):
+        self.values = []
+        self._ids = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def id_for(self, value):
+        value_id = self._ids.get(value)
+        if value_id is None:
+            value = sys.intern(value)
+            value_id = len(self.values)
+            self.values.append(value)
+            self._ids[value] = value_id
+        return value_id
+
+
+class TransactionStore(object):
+    """Columnar storage for categorized transactions.
+
+    Each transaction is a position across a handful of typed arrays; strings
+    are stored once in a StringTable and referenced by id.
+    """
+
+    def __init__(self):
+        self.dates = array('l')
+        self.amounts = array('d')
+        self.description_ids = array('l')
+        self.category_ids = array('l')
+        self.card_ids = array('l')
+        self.descriptions = StringTable()
+        self.categories = StringTable()
+        self.cards = StringTable()
+
+    def __len__(self):
+        return len(self.amounts)
+
+    def append(self, date_ordinal, description, amount, category, card):
+        self.dates.append(date_ordinal)
+        self.amounts.append(amount)
+        self.description_ids.append(self.descriptions.id_for(description))
+        self.category_ids.append(self.categories.id_for(category))
+        self.card_ids.append(self.cards.id_for(card))
+
+    def description(self, i):
+        return self.descriptions.values[self.description_ids[i]]
+
+    def category(self, i):
+        return self.categories.values[self.category_ids[i]]
+
+    def card(self, i):
+        return self.cards.values[self.card_ids[i]]
+
+    def sorted_indexes(self):
+        return sorted(range(len(self)), key=self.dates.__getitem__)
+
+
+def _dated_indexes(store, store_number):
+    for i in store.sorted_indexes():
+        yield store.dates[i], store_number, i
+
+
+def merge_stores(stores):
+    """Combine several stores into one, in transaction date order."""
+    merged = TransactionStore()
+    runs = [_dated_indexes(store, n) for n, store in enumerate(stores)]
+    for date_ordinal, store_number, i in heapq.merge(*runs):
+        store = stores[store_number]
+        merged.append(
+            date_ordinal,
+            store.description(i),
+            store.amounts[i],
+            store.category(i),
+            store.card(i),
+        )
+    return merged
@@ -0,0 +1,751 @@
+"""Headless benchmarks for the capture and detection pipeline.
+
+Frames come from a fake grabber instead of mss, so nothing here needs a
+display, a browser or pyautogui. Run with:
+
+    python benchmark.py capture --frames 2000
+    python benchmark.py latency --trials 50 --grab-ms 12 --analysis-ms 8
+    python benchmark.py governor --seconds 3 --fps 60 --idle-fps 10
+    python benchmark.py change --flashes 50
+    python benchmark.py probe --scenes 500
+    python benchmark.py roi --frames 2000
+    python benchmark.py tiles --flashes 200
+    python benchmark.py replay --rounds 5 --levels 5
+    python benchmark.py live --rounds 5 --speed 10
+    python benchmark.py trace --rounds 5
+"""
+import argparse
+import random
+import statistics
+import time
+import tracemalloc
+
+import numpy as np
+import cv2
+
+from screen import BoundingBox, CaptureThread, Frame, FrameGovernor, LatencyTrace, Screen, SourceExhausted
+from reactiontime import COLOR_FRACTION, COLOR_RANGES, GREEN_LOWER, GREEN_UPPER, ReactionTime
+from replay import Shot, replay
+from util import ChangeDetector, ColorLUT, FrameBuffers, PixelProbe, TileTracker, find_center_of_contour, find_white_contours, locate_grid
+
+# The reaction time test's colors, in BGRA as mss returns them.
+BLUE_BGRA = (209, 135, 43, 255)
+TILE_BGRA = (178, 115, 37, 255)
+WHITE_BGRA = (255, 255, 255, 255)
+GREEN_BGRA = (106, 219, 75, 255)
+RED_BGRA = (54, 38, 206, 255)
+# The sequence test's start button.
+ORANGE_BGRA = (80, 165, 255, 255)
+
+
+class FakeGrabber():
+    """Stands in for mss, cycling through prerendered BGRA frames.
+
+    Like mss it returns a new screenshot object per grab, but over the same
+    few buffers, so the benchmark measures the pipeline rather than the fake.
+    """
+
+    def __init__(self, width: int, height: int, colors=(RED_BGRA, GREEN_BGRA, BLUE_BGRA), noise: int = 8, seed: int = 0) -> None:
+        rng = np.random.default_rng(seed)
+        self.grabs = 0
+        self._shots = []
+        for color in colors:
+            frame = np.empty((height, width, 4), dtype=np.int16)
+            frame[:] = color
+            frame += rng.integers(-noise, noise + 1, size=frame.shape, dtype=np.int16)
+            raw = bytearray(np.clip(frame, 0, 255).astype(np.uint8).tobytes())
+            self._shots.append(Shot(raw, width, height))
+
+    def grab(self, monitor: dict) -> Shot:
+        shot = self._shots[self.grabs % len(self._shots)]
+        self.grabs += 1
+        return shot
+
+
+class CanvasGrabber():
+    """A fake grabber over a fixed desktop image, honoring the requested monitor.
+
+    Like mss on a retina display it returns `scale` physical pixels per
+    requested pixel, copied out of the canvas on every grab.
+    """
+
+    def __init__(self, canvas: np.ndarray, scale: int = 2) -> None:
+        self._canvas = canvas
+        self._scale = scale
+        self.bytes_grabbed = 0
+
+    def grab(self, monitor: dict) -> Shot:
+        scale = self._scale
+        top, left = monitor["top"] * scale, monitor["left"] * scale
+        width, height = monitor["width"] * scale, monitor["height"] * scale
+        raw = bytearray(self._canvas[top:top + height, left:left + width].tobytes())
+        self.bytes_grabbed += len(raw)
+        return Shot(raw, width, height)
+
+
+class SwitchingGrabber():
+    """A fake grabber that shows red until `switch_at`, then green.
+
+    Each grab sleeps for `grab_seconds` to stand in for the time mss spends
+    copying the screen, and shows the screen as it was when the grab began.
+    """
+
+    def __init__(self, width: int, height: int, grab_seconds: float, seed: int = 0) -> None:
+        self._red, self._green = FakeGrabber(width, height, colors=(RED_BGRA, GREEN_BGRA), seed=seed)._shots
+        self._grab_seconds = grab_seconds
+        self.switch_at = float("inf")
+
+    def grab(self, monitor: dict) -> Shot:
+        green = time.monotonic() >= self.switch_at
+        time.sleep(self._grab_seconds)
+        return self._green if green else self._red
+
+
+class FakeReactionGame():
+    """The reaction time test itself, as a Screen's grabber, clicker and clock.
+
+    Blue waits for a click, which turns it red; 1.5-2.5s later red turns
+    green, and clicking green turns it blue again. Clicking red is too soon
+    and also turns it blue. Time runs `speed` times faster than real time,
+    and capture isn't held in lockstep, so the game sees the same races
+    between its capture thread and its clicks as it would live. Grabs end
+    after `rounds` greens were clicked.
+    """
+
+    def __init__(self, rounds: int, speed: float = 10, seed: int = 0) -> None:
+        shots = FakeGrabber(200, 200, colors=(RED_BGRA, GREEN_BGRA, BLUE_BGRA), seed=seed)._shots
+        self._shots = dict(zip(("red", "green", "blue"), shots))
+        self._rng = random.Random(seed)
+        self._rounds = rounds
+        self._speed = speed
+        self._started = time.monotonic()
+        self._green_at = None
+        self.color = "blue"
+        # (time, color clicked)
+        self.clicks = []
+        self.reactions = []
+
+    def monotonic(self) -> float:
+        return (time.monotonic() - self._started) * self._speed
+
+    def sleep(self, seconds: float) -> None:
+        time.sleep(seconds / self._speed)
+
+    def _update(self, now: float) -> str:
+        if self.color == "red" and now >= self._green_at:
+            self.color = "green"
+        return self.color
+
+    def grab(self, monitor: dict) -> Shot:
+        if len(self.reactions) >= self._rounds:
+            raise SourceExhausted()
+        return self._shots[self._update(self.monotonic())]
+
+    def click(self, x, y) -> None:
+        now = self.monotonic()
+        color = self._update(now)
+        self.clicks.append((now, color))
+        if color == "blue":
+            self.color = "red"
+            self._green_at = now + self._rng.uniform(1.5, 2.5)
+        else:
+            if color == "green":
+                self.reactions.append(now - self._green_at)
+            self.color = "blue"
+
+
+def render_grid(width: int, height: int, lit: int | None = None, level: float = 1.0) -> np.ndarray:
+    """Draw the sequence test's 3x3 grid of tiles, with tile `lit` (0-8) `level` of the way to white."""
+    image = np.empty((height, width, 4), dtype=np.uint8)
+    image[:] = BLUE_BGRA
+    lit_color = np.round(np.add(TILE_BGRA, level * np.subtract(WHITE_BGRA, TILE_BGRA)))
+    for tile, box in enumerate(tile_boxes(width, height)):
+        image[box.top:box.top + box.height, box.left:box.left + box.width] = lit_color if tile == lit else TILE_BGRA
+    return image
+
+
+def tile_boxes(width: int, height: int) -> list:
+    """The boxes of `render_grid`'s tiles, in the same units as its size."""
+    tile_width, tile_height = width // 4, height // 4
+    boxes = []
+    for tile in range(9):
+        row, column = divmod(tile, 3)
+        top = height // 8 + row * (tile_height + height // 32)
+        left = width // 8 + column * (tile_width + width // 32)
+        boxes.append(BoundingBox(top, left, tile_width, tile_height))
+    return boxes
+
+
+def flash_schedule(flashes: int, flash_frames: int, gap_frames: int, seed: int = 0) -> list:
+    """Per frame, the lit tile or None: `flashes` random tiles, each lit for `flash_frames`."""
+    rng = random.Random(seed)
+    schedule = []
+    for _ in range(flashes):
+        schedule += [None] * gap_frames + [rng.randrange(9)] * flash_frames
+    return schedule + [None] * gap_frames
+
+
+# Brightness of a flashing tile frame by frame as it fades in and out, with
+# flicker around the halfway point.
+FADE_IN = (0.3, 0.55, 0.45, 0.55, 0.8)
+FADE_OUT = (0.8, 0.55, 0.45, 0.55, 0.3)
+
+
+def fading_schedule(flashes: int, hold_frames: int, gap_frames: int, seed: int = 0):
+    """Per frame `(lit tile, level)`, and the tiles flashed in order; a third repeat the previous tile."""
+    rng = random.Random(seed)
+    schedule = []
+    tiles = []
+    for _ in range(flashes):
+        tile = tiles[-1] if tiles and rng.random() < 1 / 3 else rng.randrange(9)
+        tiles.append(tile)
+        schedule += [(None, 0)] * gap_frames
+        schedule += [(tile, level) for level in FADE_IN] + [(tile, 1.0)] * hold_frames + [(tile, level) for level in FADE_OUT]
+    return schedule + [(None, 0)] * gap_frames, tiles
+
+
+def allocating_pipeline(screen: Screen):
+    for image in screen.capture():
+        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+        yield cv2.countNonZero(cv2.inRange(hsv, GREEN_LOWER, GREEN_UPPER))
+
+
+def buffered_pipeline(screen: Screen):
+    buffers = FrameBuffers()
+    for image in screen.frames():
+        hsv = buffers.hsv(image)
+        yield cv2.countNonZero(buffers.in_range(hsv, GREEN_LOWER, GREEN_UPPER))
+
+
+def measure(pipeline, frames: int, warmup: int = 10):
+    """Return frames per second and the transient bytes allocated per frame."""
+    results = iter(pipeline)
+    for _ in range(warmup):
+        next(results)
+
+    start = time.perf_counter()
+    for _ in range(frames):
+        next(results)
+    fps = frames / (time.perf_counter() - start)
+
+    # Traced separately since tracing slows everything down.
+    tracemalloc.start()
+    transient = 0
+    for _ in range(min(frames, 200)):
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        next(results)
+        transient += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+    return fps, transient / min(frames, 200)
+
+
+def is_green(buffers: FrameBuffers, image: np.ndarray, analysis_seconds: float) -> bool:
+    hsv = buffers.hsv(image)
+    green = cv2.countNonZero(buffers.in_range(hsv, GREEN_LOWER, GREEN_UPPER)) > hsv.shape[0] * hsv.shape[1] // 2
+    # Stands in for the rest of a detector's work.
+    time.sleep(analysis_seconds)
+    return green
+
+
+def serial_latency(screen: Screen, grabber: SwitchingGrabber, delay: float, analysis_seconds: float) -> float:
+    buffers = FrameBuffers()
+    grabber.switch_at = time.monotonic() + delay
+    for image in screen.frames():
+        if is_green(buffers, image, analysis_seconds):
+            return time.monotonic() - grabber.switch_at
+
+
+def threaded_latency(capture: CaptureThread, grabber: SwitchingGrabber, delay: float, analysis_seconds: float) -> float:
+    buffers = FrameBuffers()
+    started = time.monotonic()
+    grabber.switch_at = started + delay
+    for frame in capture.frames():
+        # Skip anything still left over from the previous trial.
+        if frame.timestamp > started and is_green(buffers, frame.image, analysis_seconds):
+            return time.monotonic() - grabber.switch_at
+
+
+def bench_latency(args):
+    rng = random.Random(args.seed)
+    box = BoundingBox(0, 0, args.width, args.height)
+    grabber = SwitchingGrabber(args.width, args.height, args.grab_ms / 1000, seed=args.seed)
+    screen = Screen(box, grabber=grabber)
+    delays = [rng.uniform(0.05, 0.1) for _ in range(args.trials)]
+    analysis_seconds = args.analysis_ms / 1000
+
+    def trial(latency, source, delay):
+        # Back to red, long enough that no grab in flight still shows green.
+        grabber.switch_at = float("inf")
+        time.sleep(args.grab_ms * 2 / 1000)
+        return latency(source, grabber, delay, analysis_seconds)
+
+    serial = [trial(serial_latency, screen, delay) for delay in delays]
+    with CaptureThread(screen) as capture:
+        threaded = [trial(threaded_latency, capture, delay) for delay in delays]
+
+    print("Red to green decision latency, {}ms grabs and {}ms analysis per frame:".format(args.grab_ms, args.analysis_ms))
+    for name, latencies in (("serial", serial), ("threaded", threaded)):
+        latencies = sorted(latencies)
+        print("  {:<9} median {:6.1f}ms  worst {:6.1f}ms".format(
+            name,
+            statistics.median(latencies) * 1000,
+            latencies[-1] * 1000,
+        ))
+    print("  threaded capture dropped {} frames the analysis never needed".format(capture.dropped))
+
+
+def governed_run(screen: Screen, grabber: SwitchingGrabber, governor: FrameGovernor | None, seconds: float):
+    """Capture for `seconds`, switching to green a third of the way in.
+
+    Returns the governor's stats, the process CPU time and how long after the
+    switch the first green frame arrived.
+    """
+    buffers = FrameBuffers()
+    started = time.monotonic()
+    cpu_started = time.process_time()
+    grabber.switch_at = started + seconds / 3
+    noticed = None
+    for image in screen.frames(governor):
+        now = time.monotonic()
+        if noticed is None and is_green(buffers, image, 0):
+            noticed = now - grabber.switch_at
+        if now - started > seconds:
+            break
+    return governor.stats(), time.process_time() - cpu_started, noticed
+
+
+def bench_governor(args):
+    grabber = SwitchingGrabber(args.width, args.height, args.grab_ms / 1000, seed=args.seed)
+    screen = Screen(BoundingBox(0, 0, args.width, args.height), grabber=grabber)
+    modes = (
+        ("unlimited", FrameGovernor()),
+        ("{:g} fps".format(args.fps), FrameGovernor(args.fps)),
+        ("adaptive", FrameGovernor(args.fps, idle_fps=args.idle_fps, hold=args.seconds / 6)),
+    )
+    print("{}s of mostly static frames, {}ms grabs:".format(args.seconds, args.grab_ms))
+    for name, governor in modes:
+        stats, cpu, noticed = governed_run(screen, grabber, governor, args.seconds)
+        print("  {:<10} {:7.1f} fps {:6.2f}ms CPU/frame {:5.1f}% CPU {:4d} idle frames, change seen after {:5.1f}ms".format(
+            name,
+            stats["fps"],
+            stats["cpu_ms_per_frame"],
+            cpu / args.seconds * 100,
+            stats["idle_frames"],
+            noticed * 1000,
+        ))
+
+
+def white_centers(images, changes: ChangeDetector | None = None):
+    """Return the lit tile centers found, once per flash, and the seconds spent."""
+    buffers = FrameBuffers()
+    found = []
+    last = None
+    start = time.perf_counter()
+    for image in images:
+        if changes and not changes.changed(image):
+            continue
+        contours = find_white_contours(image, buffers=buffers)
+        center = find_center_of_contour(contours[0]) if len(contours) == 1 else None
+        if center != last and center is not None:
+            found.append(center)
+        last = center
+    return found, time.perf_counter() - start
+
+
+def bench_change(args):
+    frames = {lit: render_grid(args.width, args.height, lit) for lit in [None] + list(range(9))}
+    images = [frames[lit] for lit in flash_schedule(args.flashes, args.flash_frames, args.gap_frames, args.seed)]
+
+    every_frame, every_frame_seconds = white_centers(images)
+    changes = ChangeDetector()
+    gated, gated_seconds = white_centers(images, changes)
+    assert gated == every_frame, "change detection missed a flash"
+
+    print("{} frames, {} flashes found:".format(len(images), len(gated)))
+    print("  every frame   {:6.3f}ms/frame".format(every_frame_seconds * 1000 / len(images)))
+    print("  on change     {:6.3f}ms/frame ({} analyzed, {} skipped, {:.1f}x)".format(
+        gated_seconds * 1000 / len(images),
+        changes.analyzed,
+        changes.skipped,
+        every_frame_seconds / gated_seconds,
+    ))
+
+
+def random_scene(rng: random.Random, width: int, height: int) -> np.ndarray:
+    """A noisy background color partly covered by a rectangle of another."""
+    palette = (BLUE_BGRA, GREEN_BGRA, RED_BGRA, WHITE_BGRA, (30, 30, 30, 255))
+    image = np.empty((height, width, 4), dtype=np.int16)
+    image[:] = rng.choice(palette)
+    rect_width, rect_height = rng.randint(0, width), rng.randint(0, height)
+    top, left = rng.randint(0, height - rect_height), rng.randint(0, width - rect_width)
+    image[top:top + rect_height, left:left + rect_width] = rng.choice(palette)
+    image += np.random.default_rng(rng.randrange(2 ** 32)).integers(-6, 7, size=image.shape, dtype=np.int16)
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+def legacy_classify(image: np.ndarray) -> str | None:
+    """The previous check: full-frame masks, summing pixel indices against 5000000."""
+    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+    for name, (lower, upper) in COLOR_RANGES.items():
+        if np.sum(np.nonzero(cv2.inRange(hsv, lower, upper))) > 5000000:
+            return name
+    return None
+
+
+def full_frame_classify(image: np.ndarray, buffers: FrameBuffers) -> str | None:
+    """The same decision as the probe, but counting every pixel of the frame."""
+    hsv = buffers.hsv(image)
+    min_count = COLOR_FRACTION * hsv.shape[0] * hsv.shape[1]
+    for name, (lower, upper) in COLOR_RANGES.items():
+        if cv2.countNonZero(buffers.in_range(hsv, lower, upper)) >= min_count:
+            return name
+    return None
+
+
+def bench_probe(args):
+    rng = random.Random(args.seed)
+    scenes = [random_scene(rng, args.width, args.height) for _ in range(args.scenes)]
+    buffers = FrameBuffers()
+    lut = ColorLUT(COLOR_RANGES)
+    probe = PixelProbe(COLOR_RANGES, grid=(args.grid, args.grid), min_fraction=COLOR_FRACTION)
+
+    decisions = {}
+    timings = {}
+    for name, classify in (
+        ("legacy", legacy_classify),
+        ("full frame", lambda image: full_frame_classify(image, buffers)),
+        ("lookup", lambda image: lut.classify(image, COLOR_FRACTION)),
+        ("probe", probe.classify),
+    ):
+        start = time.perf_counter()
+        decisions[name] = [classify(image) for image in scenes]
+        timings[name] = (time.perf_counter() - start) / len(scenes)
+
+    print("{} random {}x{} scenes, {}x{} probe grid:".format(args.scenes, args.width, args.height, args.grid, args.grid))
+    for name, seconds in timings.items():
+        agree = sum(a == b for a, b in zip(decisions[name], decisions["full frame"]))
+        print("  {:<11} {:8.1f}us/decision, agrees with full frame pixel counts on {}/{}".format(
+            name,
+            seconds * 1000000,
+            agree,
+            len(scenes),
+        ))
+
+    # How close to the threshold the scenes the probe got wrong were.
+    margins = []
+    for image, probed, counted in zip(scenes, decisions["probe"], decisions["full frame"]):
+        if probed != counted:
+            hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+            coverage = [cv2.countNonZero(cv2.inRange(hsv, lower, upper)) / (args.width * args.height)
+                        for lower, upper in COLOR_RANGES.values()]
+            margins.append(min(abs(c - COLOR_FRACTION) for c in coverage))
+    if margins:
+        print("  probe disagreements were all within {:.1%} of the {:.0%} coverage threshold".format(
+            max(margins),
+            COLOR_FRACTION,
+        ))
+
+
+def roi_run(screen: Screen, grabber: CanvasGrabber, analyze, frames: int):
+    start = time.perf_counter()
+    for _, image in zip(range(frames), screen.frames()):
+        analyze(image)
+    return (time.perf_counter() - start) / frames, grabber.bytes_grabbed / frames
+
+
+def bench_roi(args):
+    scale = 2
+    probe = PixelProbe(COLOR_RANGES, min_fraction=COLOR_FRACTION)
+    # The reaction time box, all green, somewhere on a 1000x1200 desktop.
+    desktop = np.zeros((1000 * scale, 1200 * scale, 4), dtype=np.uint8)
+    desktop[250 * scale:350 * scale, 900 * scale:1000 * scale] = GREEN_BGRA
+    box = BoundingBox(250, 900, 100, 100)
+
+    print("Reaction time, probing a 100x100 box at {}x scale:".format(scale))
+    full = Screen(box, grabber=CanvasGrabber(desktop, scale))
+    center = Screen(box, grabber=CanvasGrabber(desktop, scale))
+    region = center.add_region("center", BoundingBox(30, 30, 40, 40))
+    for name, screen, analyze in (
+        ("whole box", full, probe.classify),
+        ("center roi", center, lambda image: probe.classify(region.crop(image))),
+    ):
+        seconds, grabbed = roi_run(screen, screen.grabber, analyze, args.frames)
+        print("  {:<11} {:7.1f}us/frame {:9,.0f} bytes grabbed per frame".format(name, seconds * 1000000, grabbed))
+
+
+def bench_tiles(args):
+    schedule, flashed = fading_schedule(args.flashes, args.hold_frames, args.gap_frames, args.seed)
+    frames = {}
+    for key in set(schedule):
+        frames[key] = render_grid(args.width, args.height, *key)
+    images = [frames[key] for key in schedule]
+
+    boxes = tile_boxes(args.width, args.height)
+
+    def nearest_tile(center):
+        return min(range(9), key=lambda t: abs(boxes[t].left + boxes[t].width / 2 - center.x) + abs(boxes[t].top + boxes[t].height / 2 - center.y))
+
+    centers, contour_seconds = white_centers(images)
+    contour_tiles = [nearest_tile(c) for c in centers]
+
+    start = time.perf_counter()
+    tracker = TileTracker(locate_grid(images[0]))
+    tracker.calibrate(images[0])
+    locate_seconds = time.perf_counter() - start
+    tracked = []
+    start = time.perf_counter()
+    for image in images:
+        tracked += tracker.update(image)
+    tracker_seconds = time.perf_counter() - start
+
+    # The same tracker with a single threshold, to show what hysteresis buys.
+    single = TileTracker(locate_grid(images[0]), on=0.5, off=0.5)
+    single.calibrate(images[0])
+    single_tracked = []
+    start = time.perf_counter()
+    for image in images:
+        single_tracked += single.update(image)
+    single_seconds = time.perf_counter() - start
+
+    print("{} frames, {} fading flashes ({} repeating the previous tile):".format(
+        len(images),
+        len(flashed),
+        sum(a == b for a, b in zip(flashed, flashed[1:])),
+    ))
+    for name, seconds, tiles in (
+        ("contours", contour_seconds, contour_tiles),
+        ("tracker", tracker_seconds, tracked),
+        ("threshold", single_seconds, single_tracked),
+    ):
+        print("  {:<9} {:7.1f}us/frame, sequence {}".format(
+            name,
+            seconds * 1000000 / len(images),
+            "correct" if tiles == flashed else "wrong ({} flashes recorded)".format(len(tiles)),
+        ))
+    print("  locating the grid once took {:.1f}ms".format(locate_seconds * 1000))
+
+
+def sample_phases(phases, fps: float):
+    """Grab `(image, seconds)` phases at `fps`; phases don't have to line up with the grabs."""
+    ends = np.cumsum([seconds for _, seconds in phases])
+    timestamps = list(np.arange(0, ends[-1], 1 / fps))
+    frames = [phases[i][0] for i in np.searchsorted(ends, timestamps, side="right")]
+    return frames, timestamps
+
+
+def reaction_session(rounds: int, fps: float, seed: int = 0):
+    """A reaction time recording: per round red for 1.5-2.5s, green for 0.4s, then blue.
+
+    Returns the frames, their timestamps, the color of each frame and the
+    green onsets. Blue lasts long enough for the 3s the game waits after a
+    click, plus time to click through to the next round.
+    """
+    rng = random.Random(seed)
+    shots = FakeGrabber(200, 200, colors=(RED_BGRA, GREEN_BGRA, BLUE_BGRA), seed=seed)._shots
+    red, green, blue = (np.frombuffer(shot.raw, dtype=np.uint8).reshape(200, 200, 4) for shot in shots)
+    phases = [("blue", 1.0)]
+    for _ in range(rounds):
+        phases += [("red", rng.uniform(1.5, 2.5)), ("green", 0.4), ("blue", 3.5)]
+
+    images = {"red": red, "green": green, "blue": blue}
+    frames, timestamps = sample_phases([(images[color], seconds) for color, seconds in phases], fps)
+    ends = np.cumsum([seconds for _, seconds in phases])
+    colors = [phases[np.searchsorted(ends, t, side="right")][0] for t in timestamps]
+    onsets = [end for end, (color, _) in zip(ends, phases[1:]) if color == "green"]
+    return frames, timestamps, colors, onsets
+
+
+def sequence_session(levels: int, fps: float, seed: int = 0):
+    """A sequence recording: the start button, then `levels` levels of flashing tiles.
+
+    Level k flashes the first k tiles of the sequence, 0.4s each with 0.1s
+    between them, and then stays dark long enough for the game to click
+    them all back. Returns the frames, their timestamps and the sequence.
+    """
+    rng = random.Random(seed)
+    width, height = 800, 700
+    start_screen = np.empty((height, width, 4), dtype=np.uint8)
+    start_screen[:] = BLUE_BGRA
+    start_screen[300:375, 330:470] = ORANGE_BGRA
+    grids = [render_grid(width, height, lit) for lit in (None, *range(9))]
+    tiles = [rng.randrange(9) for _ in range(levels)]
+
+    phases = [(start_screen, 0.5), (grids[0], 2.5)]
+    for level in range(1, levels + 1):
+        for tile in tiles[:level]:
+            phases += [(grids[tile + 1], 0.4), (grids[0], 0.1)]
+        # Time to notice the last flash, wait, click and see the board go quiet.
+        phases.append((grids[0], 1 + 0.05 * level + 0.25 + 0.5))
+
+    frames, timestamps = sample_phases(phases, fps)
+    return frames, timestamps, tiles
+
+
+def percentiles(seconds) -> str:
+    p50, p95, p99 = np.percentile(np.array(seconds) * 1000, [50, 95, 99])
+    return "p50 {:.3f}ms, p95 {:.3f}ms, p99 {:.3f}ms".format(p50, p95, p99)
+
+
+def bench_replay(args):
+    frames, timestamps, colors, onsets = reaction_session(args.rounds, 120, args.seed)
+    start = time.perf_counter()
+    source = replay("reactiontime", frames, timestamps)
+    seconds = time.perf_counter() - start
+    # Clicks on green are reactions; the ones on blue start the next round.
+    reactions = [c for c in source.clicks if colors[c[3]] == "green"]
+    wrong = [c for c in source.clicks if colors[c[3]] == "red"]
+    decisions = [now - max(o for o in onsets if o <= now) + real for now, _, _, _, real in reactions]
+    print("Reaction time, {} rounds, {} frames replayed in {:.2f}s:".format(args.rounds, source.frames_replayed, seconds))
+    print("  analysis per frame {}".format(percentiles(source.analysis_seconds)))
+    print("  decision latency   {}".format(percentiles(decisions) if decisions else "n/a"))
+    print("  {} of {} greens clicked, {} clicks on red".format(len(reactions), len(onsets), len(wrong)))
+
+    frames, timestamps, tiles = sequence_session(args.levels, 60, args.seed)
+    start = time.perf_counter()
+    source = replay("sequence", frames, timestamps, goal=args.levels)
+    seconds = time.perf_counter() - start
+    # Map clicks back onto the 2x frame to see which tile they hit; the first one is the start button.
+    boxes = tile_boxes(800, 700)
+
+    def tile_at(x, y):
+        x, y = (x - 900) * 2, (y - 250) * 2
+        return next((t for t, b in enumerate(boxes) if b.left <= x < b.left + b.width and b.top <= y < b.top + b.height), None)
+
+    clicked = [tile_at(x, y) for _, x, y, _, _ in source.clicks[1:]]
+    expected = [tile for level in range(1, args.levels + 1) for tile in tiles[:level]]
+    print("Sequence, {} levels, {} frames replayed in {:.2f}s:".format(args.levels, source.frames_replayed, seconds))
+    print("  analysis per frame {}".format(percentiles(source.analysis_seconds)))
+    print("  {} of {} tiles clicked, sequence {}".format(
+        len(clicked),
+        len(expected),
+        "correct" if clicked == expected else "wrong",
+    ))
+
+
+def bench_live(args):
+    game = FakeReactionGame(args.rounds, args.speed, args.seed)
+    start = time.perf_counter()
+    ReactionTime(fps=None, grabber=game, clicker=game.click, clock=game).play(align=False)
+    seconds = time.perf_counter() - start
+    too_soon = [now for now, color in game.clicks if color == "red"]
+    print("Reaction time live at {:g}x, {} rounds in {:.2f}s:".format(args.speed, args.rounds, seconds))
+    print("  reaction (game time) {}".format(percentiles(game.reactions) if game.reactions else "n/a"))
+    print("  {} clicks, {} too soon".format(len(game.clicks), len(too_soon)))
+
+
+def bench_trace(args):
+    frames, timestamps, _, _ = reaction_session(args.rounds, 120, args.seed)
+    print("Reaction time replay, {} rounds:".format(args.rounds))
+    traced = None
+    for name in ("untraced", "traced"):
+        best = float("inf")
+        for _ in range(args.repeats):
+            trace = LatencyTrace(at_exit=False) if name == "traced" else None
+            start = time.perf_counter()
+            source = replay("reactiontime", frames, timestamps, trace=trace)
+            best = min(best, (time.perf_counter() - start) / (source.frames_replayed))
+            traced = trace or traced
+        print("  {:<9} {:6.2f}us/frame".format(name, best * 1000000))
+
+    # What a stage mark costs on its own, with and without a trace.
+    calls = 100000
+    frame = Frame(frames[0], 1, 0.0, 0)
+    for name, trace in (("disabled", None), ("enabled", LatencyTrace(at_exit=False))):
+        screen = Screen(BoundingBox(0, 0, 1, 1), trace=trace)
+        if trace:
+            trace.start()
+        start = time.perf_counter()
+        for _ in range(calls):
+            screen.mark(frame, "classify")
+        print("  mark {:<8} {:6.3f}us/call".format(name, (time.perf_counter() - start) * 1000000 / calls))
+    traced.report()
+
+
+def bench_capture(args):
+    box = BoundingBox(0, 0, args.width, args.height)
+    width, height = args.width * args.scale, args.height * args.scale
+    print("Capture pipeline, {}x{} frames (grab, HSV conversion, one mask):".format(width, height))
+    for name, pipeline in (("allocating", allocating_pipeline), ("buffered", buffered_pipeline)):
+        screen = Screen(box, grabber=FakeGrabber(width, height, seed=args.seed))
+        fps, transient = measure(pipeline(screen), args.frames)
+        print("  {:<11} {:>8.0f} fps {:>12,.0f} bytes allocated per frame".format(name, fps, transient))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seed", type=int, default=0)
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    capture_parser = subparsers.add_parser("capture", help="frame capture: fresh arrays vs reused buffers")
+    capture_parser.add_argument("--frames", type=int, default=2000)
+    capture_parser.add_argument("--width", type=int, default=400)
+    capture_parser.add_argument("--height", type=int, default=350)
+    capture_parser.add_argument("--scale", type=int, default=2)
+    capture_parser.set_defaults(func=bench_capture)
+
+    latency_parser = subparsers.add_parser("latency", help="decision latency: serial vs threaded capture")
+    latency_parser.add_argument("--trials", type=int, default=50)
+    latency_parser.add_argument("--grab-ms", type=float, default=12)
+    latency_parser.add_argument("--analysis-ms", type=float, default=8)
+    latency_parser.add_argument("--width", type=int, default=200)
+    latency_parser.add_argument("--height", type=int, default=200)
+    latency_parser.set_defaults(func=bench_latency)
+
+    governor_parser = subparsers.add_parser("governor", help="frame pacing: unlimited vs capped vs adaptive")
+    governor_parser.add_argument("--seconds", type=float, default=3)
+    governor_parser.add_argument("--fps", type=float, default=60)
+    governor_parser.add_argument("--idle-fps", type=float, default=10)
+    governor_parser.add_argument("--grab-ms", type=float, default=1)
+    governor_parser.add_argument("--width", type=int, default=200)
+    governor_parser.add_argument("--height", type=int, default=200)
+    governor_parser.set_defaults(func=bench_governor)
+
+    change_parser = subparsers.add_parser("change", help="change detection: contour search on every frame vs changed frames only")
+    change_parser.add_argument("--flashes", type=int, default=50)
+    change_parser.add_argument("--flash-frames", type=int, default=30)
+    change_parser.add_argument("--gap-frames", type=int, default=10)
+    change_parser.add_argument("--width", type=int, default=800)
+    change_parser.add_argument("--height", type=int, default=700)
+    change_parser.set_defaults(func=bench_change)
+
+    probe_parser = subparsers.add_parser("probe", help="reaction time colors: full-frame masks vs sampled pixels")
+    probe_parser.add_argument("--scenes", type=int, default=500)
+    probe_parser.add_argument("--grid", type=int, default=8)
+    probe_parser.add_argument("--width", type=int, default=200)
+    probe_parser.add_argument("--height", type=int, default=200)
+    probe_parser.set_defaults(func=bench_probe)
+
+    roi_parser = subparsers.add_parser("roi", help="grab size: whole bounding box vs regions of interest")
+    roi_parser.add_argument("--frames", type=int, default=2000)
+    roi_parser.set_defaults(func=bench_roi)
+
+    tiles_parser = subparsers.add_parser("tiles", help="sequence recording: contour search vs tile tracker")
+    tiles_parser.add_argument("--flashes", type=int, default=200)
+    tiles_parser.add_argument("--hold-frames", type=int, default=20)
+    tiles_parser.add_argument("--gap-frames", type=int, default=10)
+    tiles_parser.add_argument("--width", type=int, default=800)
+    tiles_parser.add_argument("--height", type=int, default=700)
+    tiles_parser.set_defaults(func=bench_tiles)
+
+    replay_parser = subparsers.add_parser("replay", help="both games against synthetic recordings, headless")
+    replay_parser.add_argument("--rounds", type=int, default=5)
+    replay_parser.add_argument("--levels", type=int, default=5)
+    replay_parser.set_defaults(func=bench_replay)
+
+    live_parser = subparsers.add_parser("live", help="reaction time against a simulated game, capture unpaced")
+    live_parser.add_argument("--rounds", type=int, default=5)
+    live_parser.add_argument("--speed", type=float, default=10, help="how much faster than real time to play")
+    live_parser.set_defaults(func=bench_live)
+
+    trace_parser = subparsers.add_parser("trace", help="latency tracing: overhead and per-stage percentiles")
+    trace_parser.add_argument("--rounds", type=int, default=5)
+    trace_parser.add_argument("--repeats", type=int, default=3)
+    trace_parser.set_defaults(func=bench_trace)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
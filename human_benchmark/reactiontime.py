@@ -1,30 +1,50 @@
-from time import sleep
+import argparse
 
-import pyautogui
 import numpy as np
-import cv2
 
-from screen import Screen, Point, BoundingBox
+from screen import CaptureThread, FrameGovernor, LatencyTrace, Screen, Point, BoundingBox, add_latency_arguments, latency_trace
 
-from util import hsv_has_color
+from util import PixelProbe
 
-# BLUE = rgb(43, 135, 209)
-BLUE_LOWER = np.array([48, 158, 164])
-BLUE_UPPER = np.array([210, 255, 244])
+# HSV ranges around each color, with room for a few levels of noise in
+# every channel. Hues are disjoint, so no color falls in another's range.
 
+# BLUE = rgb(43, 135, 209), hsv(103, 203, 209)
+BLUE_LOWER = np.array([95, 150, 150])
+BLUE_UPPER = np.array([115, 255, 255])
 
-# GREEN = rgb(75, 219, 106)
-GREEN_LOWER = np.array([33, 128, 206])
-GREEN_UPPER = np.array([191, 255, 244])
 
-# RED = rgb(206, 38, 54)
-RED_LOWER = np.array([0, 176, 145])
-RED_UPPER = np.array([69, 202, 221])
+# GREEN = rgb(75, 219, 106), hsv(66, 168, 219)
+GREEN_LOWER = np.array([55, 120, 150])
+GREEN_UPPER = np.array([80, 255, 255])
+
+# RED = rgb(206, 38, 54), hsv(177, 208, 206). Its hue is just short of
+# wrapping around to 0; noisy pixels that do wrap only count against it.
+RED_LOWER = np.array([165, 150, 150])
+RED_UPPER = np.array([179, 255, 255])
+
+# Checked in this order; the first color covering enough of the frame wins.
+COLOR_RANGES = {
+    "green": (GREEN_LOWER, GREEN_UPPER),
+    "red": (RED_LOWER, RED_UPPER),
+    "blue": (BLUE_LOWER, BLUE_UPPER),
+}
+# The full-frame check this replaces compared the sum of the mask's pixel
+# indices with 5000000, which for a 200x200 grab is about 60% of the pixels.
+COLOR_FRACTION = 0.6
 
 class ReactionTime():
-    def __init__(self):
+    def __init__(self, fps: float | None = 120, idle_fps: float | None = None, grabber=None, clicker=None, clock=None,
+                 trace: LatencyTrace | None = None):
+        # Grabbing faster than the display refreshes only burns CPU the
+        # browser could use; idle_fps trades latency for even less.
+        self._fps = fps
+        self._idle_fps = idle_fps
         self._bounding_box = BoundingBox(250, 900, 100, 100)
-        self._screen = Screen(bounding_box=self._bounding_box)
+        self._screen = Screen(self._bounding_box, grabber, clicker, clock, trace)
+        # The whole box changes color, so the middle of it is enough to look at.
+        self._center = self._screen.add_region("center", BoundingBox(30, 30, 40, 40))
+        self._probe = PixelProbe(COLOR_RANGES, min_fraction=COLOR_FRACTION)
         self._scale = 2
 
     def relative_point(self, point):
@@ -33,20 +53,28 @@ class ReactionTime():
             self._bounding_box.top + (point.y/2)
         )
 
-    def play(self):
-        self._screen.find_window(BoundingBox(315, 480, 165, 75))
+    def play(self, align: bool = True, lockstep: bool = False):
+        if align:
+            self._screen.find_window(BoundingBox(315, 480, 165, 75))
         click_point = self.relative_point(Point(50, 50))
 
-        for image in self._screen.capture():
-            hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-            if hsv_has_color(hsv, GREEN_LOWER, GREEN_UPPER, 5000000):
-                pyautogui.click(click_point.x, click_point.y)
-                sleep(3)
-            elif hsv_has_color(hsv, RED_LOWER, RED_UPPER, 5000000):
-                continue
-            elif hsv_has_color(hsv, BLUE_LOWER, BLUE_UPPER, 5000000):
-                sleep(1)
-                pyautogui.click(click_point.x, click_point.y)
+        screen = self._screen
+        with CaptureThread(screen, FrameGovernor(self._fps, self._idle_fps), lockstep) as capture:
+            for frame in capture.frames():
+                color = self._probe.classify(self._center.crop(frame.image))
+                screen.mark(frame, "classify")
+                if color == "green":
+                    screen.click(click_point.x, click_point.y)
+                    screen.mark(frame, "click")
+                    print("Clicked {:.1f}ms after the grab".format((screen.clock.monotonic() - frame.timestamp) * 1000))
+                    screen.sleep(3)
+                elif color == "blue":
+                    screen.sleep(1)
+                    screen.click(click_point.x, click_point.y)
 
 
-ReactionTime().play()
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    add_latency_arguments(parser)
+    args = parser.parse_args()
+    ReactionTime(trace=latency_trace(args)).play()
@@ -0,0 +1,236 @@
+"""Record live sessions and replay them headless.
+
+Record a game while it plays with:
+
+    python replay.py record reactiontime session
+
+which writes session.frames (the raw BGRA frames, memory-mapped on replay)
+and session.json (frame shape, timestamps and clicks). Replay it, without a
+display, mss or pyautogui, with:
+
+    python replay.py play reactiontime session
+"""
+import argparse
+from dataclasses import dataclass
+import json
+import time
+
+import numpy as np
+
+from screen import LatencyTrace, SourceExhausted, add_latency_arguments, click, default_grabber, latency_trace
+
+
+@dataclass
+class Shot():
+    """A grabbed frame, shaped like mss.screenshot.ScreenShot."""
+    raw: bytes
+    width: int
+    height: int
+
+    @property
+    def __array_interface__(self) -> dict:
+        return {"version": 3, "shape": (self.height, self.width, 4), "typestr": "|u1", "data": self.raw}
+
+
+def save_recording(path: str, frames, timestamps, clicks=(), compressed: bool = False) -> None:
+    """Write frames of one shape, their timestamps and `(time, x, y)` clicks.
+
+    `compressed` writes a single path.npz instead of the memory-mappable
+    path.frames and path.json.
+    """
+    frames = np.asarray(frames, dtype=np.uint8)
+    if compressed:
+        np.savez_compressed(path + ".npz", frames=frames, timestamps=timestamps, clicks=np.reshape(clicks, (-1, 3)))
+        return
+    with open(path + ".frames", "wb") as f:
+        f.write(frames.tobytes())
+    with open(path + ".json", "w") as f:
+        json.dump({"shape": frames.shape[1:], "timestamps": list(timestamps), "clicks": [list(c) for c in clicks]}, f)
+
+
+def load_recording(path: str):
+    """Return the frames, timestamps and clicks saved at `path`."""
+    if path.endswith(".npz"):
+        with np.load(path) as recording:
+            if not len(recording["timestamps"]):
+                raise ValueError("{} has no frames to replay".format(path))
+            return recording["frames"], recording["timestamps"], recording["clicks"].tolist()
+    with open(path + ".json", "r") as f:
+        meta = json.load(f)
+    # A recording stopped before its first grab has no frame shape.
+    if not meta["timestamps"]:
+        raise ValueError("{} has no frames to replay".format(path))
+    shape = (len(meta["timestamps"]),) + tuple(meta["shape"])
+    frames = np.memmap(path + ".frames", dtype=np.uint8, mode="r", shape=shape)
+    return frames, np.array(meta["timestamps"]), meta["clicks"]
+
+
+class Recorder():
+    """Passes grabs and clicks through to the real ones, recording both.
+
+    Frames are appended to path.frames as they are grabbed; `close` writes
+    path.json with the timestamps and clicks. Only one area is recorded: a
+    grab of another one, like the game's frame loop grabbing only its
+    regions after `Screen.find_window` grabbed the whole window, starts the
+    recording over.
+    """
+
+    def __init__(self, path: str, grabber=None, clicker=click) -> None:
+        self._path = path
+        self._grabber = grabber
+        self._clicker = clicker
+        self._frames = open(path + ".frames", "wb")
+        self._monitor = None
+        self._shape = None
+        self.timestamps = []
+        self.clicks = []
+
+    def grab(self, monitor: dict):
+        sct_image = (self._grabber or default_grabber()).grab(monitor)
+        if monitor != self._monitor:
+            self._frames.seek(0)
+            self._frames.truncate()
+            self._monitor = monitor
+            self._shape = None
+            self.timestamps = []
+            self.clicks = []
+        shape = (sct_image.height, sct_image.width, 4)
+        if self._shape not in (None, shape):
+            raise ValueError("recorded frames must all be the same size, got {} after {}".format(shape, self._shape))
+        self._shape = shape
+        self._frames.write(sct_image.raw)
+        self.timestamps.append(time.monotonic())
+        return sct_image
+
+    def click(self, x, y) -> None:
+        self._clicker(x, y)
+        self.clicks.append([time.monotonic(), x, y])
+
+    def close(self) -> None:
+        self._frames.close()
+        start = self.timestamps[0] if self.timestamps else 0
+        with open(self._path + ".json", "w") as f:
+            json.dump({
+                "shape": self._shape,
+                "timestamps": [t - start for t in self.timestamps],
+                "clicks": [[t - start, x, y] for t, x, y in self.clicks],
+            }, f)
+
+
+class Replay():
+    """Plays a recording back as a Screen's grabber, clicker and clock.
+
+    Time is virtual. It starts at the first frame, each grab moves it on to
+    the next frame, and `sleep` moves it forward without waiting, so a grab
+    after a sleep skips to whatever was on screen by then, like a live
+    capture. Analysis takes no virtual time, which makes replays
+    deterministic; the real time it takes is recorded instead, per frame in
+    `analysis_seconds` and per click since its frame was grabbed.
+    """
+
+    def __init__(self, frames, timestamps) -> None:
+        self.frames = frames
+        self.timestamps = np.asarray(timestamps, dtype=float)
+        self._now = float(self.timestamps[0])
+        self._index = -1
+        self._grabbed_at = None
+        self.analysis_seconds = []
+        # (virtual time, x, y, frame index, real seconds since that frame was grabbed)
+        self.clicks = []
+
+    @property
+    def frames_replayed(self) -> int:
+        return self._index + 1
+
+    def monotonic(self) -> float:
+        return self._now
+
+    def sleep(self, seconds: float) -> None:
+        self._now += seconds
+
+    def grab(self, monitor: dict) -> Shot:
+        if self._grabbed_at is not None:
+            self.analysis_seconds.append(time.perf_counter() - self._grabbed_at)
+        on_screen = int(np.searchsorted(self.timestamps, self._now, side="right")) - 1
+        index = max(self._index + 1, on_screen)
+        if index >= len(self.frames):
+            raise SourceExhausted()
+        self._index = index
+        self._now = max(self._now, float(self.timestamps[index]))
+        frame = self.frames[index]
+        self._grabbed_at = time.perf_counter()
+        return Shot(frame, frame.shape[1], frame.shape[0])
+
+    def click(self, x, y) -> None:
+        self.clicks.append((self._now, x, y, self._index, time.perf_counter() - self._grabbed_at))
+
+
+def make_game(name: str, **kwargs):
+    if name == "reactiontime":
+        from reactiontime import ReactionTime
+        return ReactionTime(**kwargs)
+    from sequence import Sequence
+    return Sequence(**kwargs)
+
+
+def play(game, goal: int | None, **kwargs) -> None:
+    if goal is None:
+        game.play(**kwargs)
+    else:
+        game.play(goal, **kwargs)
+
+
+def replay(name: str, frames, timestamps, goal: int = 200, trace: LatencyTrace | None = None) -> Replay:
+    """Play a game against recorded frames and return the finished Replay."""
+    source = Replay(frames, timestamps)
+    # Replays have their own timeline; pacing the grabs would only slow them down.
+    game = make_game(name, fps=None, grabber=source, clicker=source.click, clock=source, trace=trace)
+    play(game, None if name == "reactiontime" else goal, align=False, lockstep=True)
+    return source
+
+
+def record(args) -> None:
+    recorder = Recorder(args.path)
+    game = make_game(args.game, grabber=recorder, clicker=recorder.click, trace=latency_trace(args))
+    try:
+        play(game, None if args.game == "reactiontime" else args.goal)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        recorder.close()
+    print("Recorded {} frames and {} clicks to {}".format(len(recorder.timestamps), len(recorder.clicks), args.path))
+
+
+def play_back(args) -> None:
+    frames, timestamps, recorded_clicks = load_recording(args.path)
+    source = replay(args.game, frames, timestamps, args.goal, latency_trace(args))
+    analysis = np.array(source.analysis_seconds) * 1000
+    print("Replayed {} of {} frames, {} clicks ({} when recorded)".format(
+        source.frames_replayed,
+        len(source.frames),
+        len(source.clicks),
+        len(recorded_clicks),
+    ))
+    if len(analysis):
+        print("Analysis per frame: p50 {:.3f}ms, p95 {:.3f}ms, p99 {:.3f}ms".format(*np.percentile(analysis, [50, 95, 99])))
+    for (now, x, y, _, _), recorded in zip(source.clicks, recorded_clicks):
+        print("  click at {:.3f}s ({}, {}), recorded at {:.3f}s ({}, {})".format(now, x, y, *recorded))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for command, func in (("record", record), ("play", play_back)):
+        command_parser = subparsers.add_parser(command)
+        command_parser.add_argument("game", choices=("reactiontime", "sequence"))
+        command_parser.add_argument("path", help="recording, without the .frames/.json suffix, or an .npz file")
+        command_parser.add_argument("--goal", type=int, default=200, help="sequence length to play up to")
+        add_latency_arguments(command_parser)
+        command_parser.set_defaults(func=func)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
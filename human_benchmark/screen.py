@@ -1,11 +1,40 @@
 from dataclasses import dataclass
+import atexit
+import json
+import threading
+import time
 
 import numpy as np
 import cv2
-from mss import mss
 
 
-sct = mss()
+_local = threading.local()
+
+
+def default_grabber():
+    # Created on first use, so modules can be imported without a display, and
+    # once per thread since mss instances can't be shared between threads.
+    sct = getattr(_local, "sct", None)
+    if sct is None:
+        from mss import mss
+        sct = _local.sct = mss()
+    return sct
+
+
+class SourceExhausted(Exception):
+    """Raised by a grabber that has no frames left, like a finished replay."""
+
+
+def click(x, y) -> None:
+    # Imported on first use, since pyautogui needs a display.
+    import pyautogui
+    pyautogui.click(x, y)
+
+
+def frame_view(sct_image) -> np.ndarray:
+    """View the raw BGRA bytes of a grab as a (height, width, 4) array, without copying."""
+    return np.frombuffer(sct_image.raw, dtype=np.uint8).reshape(sct_image.height, sct_image.width, 4)
+
 
 @dataclass
 class BoundingBox():
@@ -30,14 +59,109 @@ class Point():
     x: int
     y: int
 
+class Region():
+    """A named sub-rectangle of a Screen, relative to its bounding box.
+
+    `crop` views the region inside a frame from `Screen.frames` without
+    copying, and `hsv` converts it into a buffer the region keeps, so each
+    region only ever pays for its own pixels.
+    """
+
+    def __init__(self, name: str, box: BoundingBox) -> None:
+        self.name = name
+        self.box = box
+        self._grab_box = None
+        self._slices = None
+        self._hsv = None
+
+    def _place(self, grab_box: BoundingBox) -> None:
+        self._grab_box = grab_box
+        self._slices = None
+
+    def crop(self, image: np.ndarray) -> np.ndarray:
+        if self._slices is None or self._slices[2] != image.shape:
+            # Frames can be scaled up from the requested box, e.g. on a retina display.
+            scale = image.shape[1] / self._grab_box.width
+            top = round((self.box.top - self._grab_box.top) * scale)
+            left = round((self.box.left - self._grab_box.left) * scale)
+            self._slices = (
+                slice(top, top + round(self.box.height * scale)),
+                slice(left, left + round(self.box.width * scale)),
+                image.shape,
+            )
+        rows, columns, _ = self._slices
+        return image[rows, columns]
+
+    def hsv(self, image: np.ndarray) -> np.ndarray:
+        region = self.crop(image)
+        if self._hsv is None or self._hsv.shape[:2] != region.shape[:2]:
+            self._hsv = np.empty(region.shape[:2] + (3,), dtype=np.uint8)
+        return cv2.cvtColor(region, cv2.COLOR_BGR2HSV, dst=self._hsv)
+
+
 class Screen():
-    def __init__(self, bounding_box: BoundingBox) -> None:
+    """Where frames come from, clicks go and time passes for a game.
+
+    By default frames are grabbed with mss, clicks go through pyautogui and
+    the clock is the `time` module. Any of them can be swapped, e.g. for a
+    `replay.Replay`, which is all three.
+    """
+
+    def __init__(self, bounding_box: BoundingBox, grabber=None, clicker=None, clock=None,
+                 trace: "LatencyTrace | None" = None) -> None:
         self._bounding_box = bounding_box
+        self._monitor = bounding_box.to_dict()
+        self._grabber = grabber
+        self._clicker = clicker or click
+        self.clock = clock or time
+        self.trace = trace
+        self.regions = {}
+        self._grab_monitor = self._monitor
+        # When the last click went out and when the latest grab in `frames` began, on `clock`.
+        self.last_click = float("-inf")
+        self.grab_started = None
+
+    def click(self, x, y) -> None:
+        self._clicker(x, y)
+        self.last_click = self.clock.monotonic()
+
+    def sleep(self, seconds: float) -> None:
+        self.clock.sleep(seconds)
+
+    def mark(self, frame: "Frame", stage: str) -> None:
+        """Record that `frame` finished `stage`, when tracing latency."""
+        if self.trace:
+            self.trace.mark(frame.row, stage)
+
+    def add_region(self, name: str, box: BoundingBox) -> Region:
+        """Register a region of interest; `frames` then only grabs the area covering all of them."""
+        region = self.regions[name] = Region(name, box)
+        top = min(r.box.top for r in self.regions.values())
+        left = min(r.box.left for r in self.regions.values())
+        grab_box = BoundingBox(
+            top,
+            left,
+            max(r.box.left + r.box.width for r in self.regions.values()) - left,
+            max(r.box.top + r.box.height for r in self.regions.values()) - top,
+        )
+        for r in self.regions.values():
+            r._place(grab_box)
+        self._grab_monitor = BoundingBox(
+            self._bounding_box.top + grab_box.top,
+            self._bounding_box.left + grab_box.left,
+            grab_box.width,
+            grab_box.height,
+        ).to_dict()
+        return region
+
+    @property
+    def grabber(self):
+        return self._grabber or default_grabber()
 
     def find_window(self, alignment_rec: BoundingBox | None):
         print("Finding window")
         while True:
-            image = np.array(sct.grab(self._bounding_box.to_dict()))
+            image = np.array(self.grabber.grab(self._monitor))
 
             if (alignment_rec):
                 cv2.rectangle(image,
@@ -52,10 +176,340 @@ class Screen():
                 break
 
     def single(self):
-        sct_image = sct.grab(self._bounding_box.to_dict())
+        sct_image = self.grabber.grab(self._monitor)
         return np.array(sct_image)
 
     def capture(self):
         while True:
-            sct_image = sct.grab(self._bounding_box.to_dict())
+            sct_image = self.grabber.grab(self._monitor)
             yield np.array(sct_image)
+
+    def frames(self, governor: "FrameGovernor | None" = None):
+        """Like `capture`, but yields read-only views over the grabbed bytes instead of copies.
+
+        A frame is only valid until the next one is requested; pair it with
+        `util.FrameBuffers` to convert and mask it without allocating. A
+        `governor` paces the grabs, otherwise they run as fast as possible.
+        Once regions are registered, only the area covering them is grabbed;
+        use `Region.crop` to find each one in the frame. Ends when the
+        grabber raises SourceExhausted.
+        """
+        grab = self.grabber.grab
+        monitor = self._grab_monitor
+        clock = self.clock
+        trace = self.trace
+        while True:
+            if governor:
+                governor.wait()
+            if trace:
+                trace.start()
+            self.grab_started = clock.monotonic()
+            try:
+                sct_image = grab(monitor)
+            except SourceExhausted:
+                return
+            image = frame_view(sct_image)
+            if trace:
+                trace.mark(trace.row, "grab")
+            if governor:
+                governor.observe(image)
+            yield image
+
+
+@dataclass
+class Frame():
+    image: np.ndarray
+    sequence: int
+    timestamp: float
+    # The frame's row in the screen's LatencyTrace, if there is one.
+    row: int | None = None
+
+
+# Stages of a frame's way from the screen to a click, in order.
+LATENCY_STAGES = ("grab", "queue", "classify", "click")
+# Upper edges of the latency histogram's buckets, in ms.
+LATENCY_BUCKETS_MS = (0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100)
+
+
+class LatencyTrace():
+    """Times each frame's stages from grab to click, for latency percentiles.
+
+    Every frame gets a row in a preallocated ring of the last `capacity`
+    frames, holding when its grab started and when each stage ended. A
+    stage's latency is the time since the stage before it: "grab" is the
+    grab itself, "queue" the wait until the game picks the frame up,
+    "classify" the analysis and "click" the click. Frames that were dropped
+    or never clicked on only count towards the stages they reached.
+
+    Percentiles are printed at exit and, with a `path`, written there as
+    JSON along with histograms. `overlay` shows them live in a window. A
+    Screen without a trace does none of this, which leaves only a few
+    `if` checks on the hot path.
+    """
+
+    def __init__(self, capacity: int = 4096, path: str | None = None, overlay: bool = False,
+                 at_exit: bool = True) -> None:
+        self._columns = {stage: column for column, stage in enumerate(LATENCY_STAGES, start=1)}
+        self._times = np.full((capacity, len(LATENCY_STAGES) + 1), np.nan)
+        self._frames = 0
+        self._path = path
+        self._overlay = overlay
+        self._shown = float("-inf")
+        self.row = None
+        if at_exit:
+            atexit.register(self.report)
+
+    def start(self) -> int:
+        """Start a row for the frame about to be grabbed and return it."""
+        self.row = row = self._frames % len(self._times)
+        self._frames += 1
+        times = self._times[row]
+        times[:] = np.nan
+        times[0] = time.perf_counter()
+        return row
+
+    def mark(self, row: int, stage: str) -> None:
+        self._times[row, self._columns[stage]] = time.perf_counter()
+
+    def latencies(self) -> dict:
+        """Per stage, and "total" from grab to click, the recorded latencies in ms."""
+        times = self._times[:min(self._frames, len(self._times))]
+        latencies = dict(zip(LATENCY_STAGES, np.diff(times, axis=1).T * 1000))
+        latencies["total"] = (times[:, -1] - times[:, 0]) * 1000
+        return {stage: ms[~np.isnan(ms)] for stage, ms in latencies.items()}
+
+    def percentiles(self) -> dict:
+        return {
+            stage: dict(zip(("p50", "p95", "p99"), np.percentile(ms, [50, 95, 99])), count=len(ms))
+            for stage, ms in self.latencies().items() if len(ms)
+        }
+
+    def report(self) -> None:
+        percentiles = self.percentiles()
+        if not percentiles:
+            return
+        print("Latency over the last {} frames:".format(min(self._frames, len(self._times))))
+        for stage, p in percentiles.items():
+            print("  {:<8} p50 {p50:8.3f}ms  p95 {p95:8.3f}ms  p99 {p99:8.3f}ms  ({count} frames)".format(stage, **p))
+        if self._path:
+            buckets = [0, *LATENCY_BUCKETS_MS, float("inf")]
+            latencies = self.latencies()
+            with open(self._path, "w") as f:
+                json.dump({
+                    stage: dict(p, histogram=np.histogram(latencies[stage], buckets)[0].tolist())
+                    for stage, p in percentiles.items()
+                } | {"buckets_ms": LATENCY_BUCKETS_MS}, f, indent=2)
+
+    def show(self, image: np.ndarray) -> None:
+        """Show the running percentiles over `image`, at most a few times a second."""
+        now = time.perf_counter()
+        if not self._overlay or now - self._shown < 0.25:
+            return
+        self._shown = now
+        overlay = cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
+        for line, (stage, p) in enumerate(self.percentiles().items()):
+            text = "{} {:.2f}/{:.2f}ms".format(stage, p["p50"], p["p99"])
+            cv2.putText(overlay, text, (5, 15 + 15 * line), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 0, 255), 1)
+        cv2.imshow("latency", overlay)
+        cv2.waitKey(1)
+
+
+def add_latency_arguments(parser) -> None:
+    parser.add_argument("--latency", action="store_true", help="print per-stage latency percentiles at exit")
+    parser.add_argument("--latency-file", help="also write them, with histograms, to this JSON file")
+    parser.add_argument("--overlay", action="store_true", help="show the percentiles live in a window")
+
+
+def latency_trace(args) -> LatencyTrace | None:
+    if not (args.latency or args.latency_file or args.overlay):
+        return None
+    return LatencyTrace(path=args.latency_file, overlay=args.overlay)
+
+
+class FrameGovernor():
+    """Paces a capture loop to a target frame rate.
+
+    `fps` caps the rate, or leaves it unlimited when None. With `idle_fps`
+    the loop is adaptive: it polls at that slower rate until a frame differs
+    from the previous one, then runs at `fps` until nothing has changed for
+    `hold` seconds. A change is only seen at the next idle poll, so idle
+    polling can add up to 1 / idle_fps to the time it takes to notice one.
+
+    Changes are found by comparing every `sample_step`th pixel in each
+    direction against the previous frame's.
+    """
+
+    def __init__(self, fps: float | None = None, idle_fps: float | None = None, hold: float = 1.0,
+                 sample_step: int = 16, tolerance: int = 8) -> None:
+        self._interval = 1 / fps if fps else 0
+        self._idle_interval = 1 / idle_fps if idle_fps else None
+        self._hold = hold
+        self._sample_step = sample_step
+        self._tolerance = tolerance
+        self._sample = None
+        self._last_change = float("-inf")
+        self._last_tick = None
+        self._started = None
+        self._cpu_started = None
+        self.frames = 0
+        self.idle_frames = 0
+        # Both updated per frame on the thread running the loop, since
+        # thread_time() only means anything on the thread that reads it.
+        self.seconds = 0.0
+        self.cpu_seconds = 0.0
+
+    @property
+    def idle(self) -> bool:
+        return self._idle_interval is not None and time.monotonic() - self._last_change > self._hold
+
+    def wait(self) -> None:
+        now = time.monotonic()
+        if self._started is None:
+            self._started = now
+            self._cpu_started = time.thread_time()
+        elif self.idle:
+            self.idle_frames += 1
+            time.sleep(max(0, self._last_tick + self._idle_interval - now))
+        elif self._interval:
+            time.sleep(max(0, self._last_tick + self._interval - now))
+        self._last_tick = time.monotonic()
+
+    def observe(self, image: np.ndarray) -> bool:
+        """Record a grabbed frame and return whether it changed from the last one."""
+        self.frames += 1
+        self.seconds = time.monotonic() - self._started
+        self.cpu_seconds = time.thread_time() - self._cpu_started
+        if self._idle_interval is None:
+            return True
+        sample = image[::self._sample_step, ::self._sample_step].astype(np.int16)
+        changed = self._sample is None or np.abs(sample - self._sample).max() > self._tolerance
+        self._sample = sample
+        if changed:
+            self._last_change = time.monotonic()
+        return changed
+
+    def stats(self) -> dict:
+        """Achieved frame rate and CPU time per frame, of the thread running the loop.
+
+        Safe to call from any thread: it only reads what the loop recorded.
+        """
+        if not self.frames or not self.seconds:
+            return {"fps": 0.0, "cpu_ms_per_frame": 0.0, "idle_frames": self.idle_frames}
+        return {
+            "fps": self.frames / self.seconds,
+            "cpu_ms_per_frame": self.cpu_seconds * 1000 / self.frames,
+            "idle_frames": self.idle_frames,
+        }
+
+
+class CaptureThread():
+    """Grabs frames on a background thread into a single "latest frame" slot.
+
+    Capture keeps running while the caller analyzes a frame or sleeps after a
+    click, and `frames` always hands out the freshest grab. Frames that were
+    replaced before anyone looked at them are counted in `dropped`. Frames
+    grabbed before the screen's last click are skipped, since they show the
+    screen as it was before the click.
+
+    In `lockstep` the thread instead waits until the next frame is asked
+    for before grabbing it, which makes replays deterministic.
+
+    If grabbing fails, capture stops and the error is raised from `latest`
+    (and so `frames`) in the consumer's thread.
+    """
+
+    def __init__(self, screen: Screen, governor: FrameGovernor | None = None, lockstep: bool = False) -> None:
+        self._screen = screen
+        self.governor = governor
+        self._lockstep = lockstep
+        self._condition = threading.Condition()
+        self._latest = None
+        self._running = False
+        self._error = None
+        self._thread = None
+        self._seen = 0
+        self._requested = 0
+        self.dropped = 0
+
+    def __enter__(self) -> "CaptureThread":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        self._running = True
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="capture", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            if self.governor:
+                print("Captured at {fps:.1f} fps, {cpu_ms_per_frame:.2f}ms CPU per frame".format(**self.governor.stats()))
+
+    def _run(self) -> None:
+        screen = self._screen
+        trace = screen.trace
+        try:
+            for sequence, image in enumerate(screen.frames(self.governor), start=1):
+                if not self._running:
+                    break
+                # A grab shows the screen as it was when the grab began, which is what a click must come after.
+                frame = Frame(image, sequence, screen.grab_started, trace.row if trace else None)
+                with self._condition:
+                    self._latest = frame
+                    self._condition.notify_all()
+                    if self._lockstep:
+                        self._condition.wait_for(lambda: self._requested > sequence or not self._running)
+        except Exception as e:  # noqa: BLE001 - handed to the consumer by latest()
+            self._error = e
+        finally:
+            # Out of frames, or failed; wake up anyone still waiting for one.
+            with self._condition:
+                self._running = False
+                self._condition.notify_all()
+
+    def latest(self, after: int = 0, timeout: float | None = None) -> Frame | None:
+        """Wait for a frame newer than sequence number `after` and return the newest one.
+
+        Returns None if capture stopped first, or raises the error that stopped it.
+        """
+        def ready():
+            return not self._running or (self._latest is not None and self._latest.sequence > after)
+
+        with self._condition:
+            self._condition.wait_for(ready, timeout)
+            if self._latest is None or self._latest.sequence <= after:
+                if self._error is not None:
+                    raise self._error
+                return None
+            return self._latest
+
+    def frames(self):
+        """Yield the newest frame grabbed since the last click each time, never the same one twice."""
+        trace = self._screen.trace
+        frame = None
+        while True:
+            if trace and frame:
+                trace.show(frame.image)
+            with self._condition:
+                self._requested = self._seen + 1
+                self._condition.notify_all()
+            frame = self.latest(self._seen)
+            if frame is None:
+                return
+            if trace:
+                trace.mark(frame.row, "queue")
+            self.dropped += frame.sequence - self._seen - 1
+            self._seen = frame.sequence
+            if frame.timestamp <= self._screen.last_click:
+                frame = None
+                continue
+            yield frame
@@ -1,16 +1,28 @@
-from time import sleep
+import argparse
 
-import pyautogui
 import numpy as np
 import cv2
 
-from screen import Screen, Point, BoundingBox
-from util import find_center_of_contour, find_colored_contours, find_white_contours
+from screen import CaptureThread, FrameGovernor, LatencyTrace, Screen, Point, BoundingBox, add_latency_arguments, latency_trace
+from util import ChangeDetector, FrameBuffers, TileTracker, find_center_of_contour, find_colored_contours, locate_grid
+
+# How long no tile may be lit after our clicks before the next sequence is watched.
+CLICK_FLASH_SECONDS = 0.25
 
 class Sequence():
-    def __init__(self):
+    def __init__(self, fps: float | None = 60, idle_fps: float | None = None, grabber=None, clicker=None, clock=None,
+                 trace: LatencyTrace | None = None):
+        self._fps = fps
+        self._idle_fps = idle_fps
         self._bounding_box = BoundingBox(250, 900, 400, 350)
-        self._screen = Screen(bounding_box=self._bounding_box)
+        # No regions: the grid is only located once the game has started, and
+        # TileTracker reads just a few pixels per tile of the whole box anyway.
+        self._screen = Screen(self._bounding_box, grabber, clicker, clock, trace)
+        self._buffers = FrameBuffers()
+        # Until the grid is found the page sits still for most frames; the
+        # searches for the start button and the grid only run on ones that
+        # changed. TileTracker is as cheap as the check, so it isn't gated.
+        self._changes = ChangeDetector()
         self._scale = 2
 
     def relative_point(self, point):
@@ -19,54 +31,88 @@ class Sequence():
             self._bounding_box.top + (point.y/2)
         )
 
-    def play(self, goal) -> None:
-        centers = []
-        started = False
+    def play(self, goal, align: bool = True, lockstep: bool = False) -> None:
+        if align:
+            # Align window with start button
+            self._screen.find_window(BoundingBox(315, 480, 165, 75))
 
-        # Align window with start button
-        self._screen.find_window(BoundingBox(315, 480, 165, 75))
+        with CaptureThread(self._screen, FrameGovernor(self._fps, self._idle_fps), lockstep) as capture:
+            self._play(capture, goal)
+        print("Dropped {} frames while analyzing".format(capture.dropped))
+        print("Searched {} changed frames for the start button and grid, skipped {}".format(
+            self._changes.analyzed,
+            self._changes.skipped,
+        ))
+
+    def _play(self, capture, goal) -> None:
+        screen = self._screen
+        changes = self._changes
+        started = False
 
         # Find the orange start button and click
-        for image in self._screen.capture():
-            contours = find_colored_contours(image, np.array([0,111,136]), np.array([59,190,255]))
+        changes.reset()
+        for frame in capture.frames():
+            if not changes.changed(frame.image):
+                continue
+            contours = find_colored_contours(frame.image, np.array([0,111,136]), np.array([59,190,255]), self._buffers)
             if not started and contours:
                 print("Starting")
                 center = find_center_of_contour(contours[0])
-                sleep(2)
+                screen.sleep(2)
                 relative = self.relative_point(center)
-                pyautogui.click(relative.x, relative.y)
-                sleep(0.2)
+                screen.click(relative.x, relative.y)
+                screen.sleep(0.2)
                 break
 
+        tracker = None
+        changes.reset()
+        for frame in capture.frames():
+            if not changes.changed(frame.image):
+                continue
+            rects = locate_grid(frame.image)
+            if rects:
+                tracker = TileTracker(rects)
+                tracker.calibrate(frame.image)
+                break
+        if tracker is None:
+            return
+
         for target in range(1, goal + 1):
-            centers = []
+            tiles = []
             print(f"Waiting for {target}")
-            for image in self._screen.capture():
-                contours = find_white_contours(image)
-                if len(contours) not in {1, 2}:
-                    continue
-
-                last_center = None if len(centers) == 0 else centers[-1]
-                if len(contours) == 1:
-                    contour = contours[0]
-                    if find_center_of_contour(contour) == last_center:
-                        continue
-                else:
-                    contour = next(c for c in contours if find_center_of_contour(c) != last_center)
-
-                centers.append(find_center_of_contour(contour))
-                if len(centers) == target:
+            for frame in capture.frames():
+                tiles += tracker.update(frame.image)
+                # Clicks wait for the whole sequence, so only analysis is traced.
+                screen.mark(frame, "classify")
+                if len(tiles) >= target:
                     break
+            else:
+                return
 
             print("Found targets")
-            sleep(1)
+            screen.sleep(1)
 
-            for center in centers:
-                relative = self.relative_point(center)
-                pyautogui.click(relative.x, relative.y)
-                sleep(0.05)
+            for tile in tiles[:target]:
+                relative = self.relative_point(tracker.center(tile))
+                screen.click(relative.x, relative.y)
+                screen.sleep(0.05)
+
+            # Clicked tiles light up too; wait for them to go dark before
+            # watching for the next sequence.
+            quiet_since = None
+            for frame in capture.frames():
+                tracker.update(frame.image)
+                if tracker.lit.any():
+                    quiet_since = None
+                elif quiet_since is None:
+                    quiet_since = frame.timestamp
+                elif frame.timestamp - quiet_since >= CLICK_FLASH_SECONDS:
+                    break
 
 
 if __name__ == "__main__":
-    sequence = Sequence()
+    parser = argparse.ArgumentParser()
+    add_latency_arguments(parser)
+    args = parser.parse_args()
+    sequence = Sequence(trace=latency_trace(args))
     sequence.play(200)
\ No newline at end of file
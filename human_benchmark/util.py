@@ -3,16 +3,104 @@ import cv2
 
 from screen import Point
 
+# HSV frames kept alive at once, so a caller can still hold the previous
+# frame's conversion while the next one is written.
+FRAME_RING_SIZE = 2
 
-def find_white_contours(image, sensitivity=15):
+
+class FrameBuffers():
+    """Preallocated HSV and mask arrays reused round robin across frames.
+
+    `cv2.cvtColor` and `cv2.inRange` write into them through `dst=`, so once
+    the first frame has sized them, converting and masking a frame of the
+    same size allocates nothing.
+    """
+
+    def __init__(self, ring_size: int = FRAME_RING_SIZE) -> None:
+        self._ring_size = ring_size
+        self._shape = None
+        self._hsv = []
+        self._masks = []
+        self._slot = 0
+
+    def _allocate(self, shape) -> None:
+        height, width = shape[:2]
+        self._shape = shape
+        self._hsv = [np.empty((height, width, 3), dtype=np.uint8) for _ in range(self._ring_size)]
+        self._masks = [np.empty((height, width), dtype=np.uint8) for _ in range(self._ring_size)]
+
+    def hsv(self, image: np.ndarray) -> np.ndarray:
+        if image.shape != self._shape:
+            self._allocate(image.shape)
+        self._slot = (self._slot + 1) % self._ring_size
+        return cv2.cvtColor(image, cv2.COLOR_BGR2HSV, dst=self._hsv[self._slot])
+
+    def in_range(self, hsv: np.ndarray, lower, upper) -> np.ndarray:
+        """Mask `hsv`, which must be the latest array returned by `hsv`."""
+        return cv2.inRange(hsv, lower, upper, dst=self._masks[self._slot])
+
+
+class ChangeDetector():
+    """Tells whether a frame differs from the last one that was analyzed.
+
+    Each frame is shrunk to a small grayscale thumbnail, which is compared
+    with the thumbnail of the last frame that counted as changed, so the
+    full analysis can be skipped for frames where nothing moved. `analyzed`
+    and `skipped` count the frames on each side.
+
+    The thumbnail is bilinearly sampled rather than area averaged, which
+    reads only a few pixels per thumbnail pixel; changes much smaller than
+    the frame size / `size` spacing between samples can be missed.
+    """
+
+    def __init__(self, size: tuple[int, int] = (64, 64), tolerance: int = 12) -> None:
+        width, height = size
+        self._size = size
+        self._tolerance = tolerance
+        self._thumbnails = {}
+        # The current frame's thumbnail, then the reference it is compared to.
+        self._gray = [np.empty((height, width), dtype=np.uint8) for _ in range(2)]
+        self._diff = np.empty((height, width), dtype=np.uint8)
+        self._has_reference = False
+        self.analyzed = 0
+        self.skipped = 0
+
+    def reset(self) -> None:
+        """Treat the next frame as changed."""
+        self._has_reference = False
+
+    def changed(self, image: np.ndarray) -> bool:
+        channels = image.shape[2]
+        thumbnail = self._thumbnails.get(channels)
+        if thumbnail is None:
+            width, height = self._size
+            thumbnail = self._thumbnails[channels] = np.empty((height, width, channels), dtype=np.uint8)
+        cv2.resize(image, self._size, dst=thumbnail, interpolation=cv2.INTER_LINEAR)
+
+        current, reference = self._gray
+        cv2.cvtColor(thumbnail, cv2.COLOR_BGRA2GRAY if channels == 4 else cv2.COLOR_BGR2GRAY, dst=current)
+        if self._has_reference and cv2.absdiff(current, reference, dst=self._diff).max() <= self._tolerance:
+            self.skipped += 1
+            return False
+
+        self._gray.reverse()
+        self._has_reference = True
+        self.analyzed += 1
+        return True
+
+
+def find_white_contours(image, sensitivity=15, buffers=None):
     lower_white = np.array([0,0,255-sensitivity])
     upper_white = np.array([255,sensitivity,255])
-    return find_colored_contours(image, lower_white, upper_white)
-
-def find_colored_contours(image, lower, upper):
-    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+    return find_colored_contours(image, lower_white, upper_white, buffers)
 
-    mask = cv2.inRange(hsv, lower, upper)
+def find_colored_contours(image, lower, upper, buffers=None):
+    if buffers:
+        hsv = buffers.hsv(image)
+        mask = buffers.in_range(hsv, lower, upper)
+    else:
+        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+        mask = cv2.inRange(hsv, lower, upper)
     contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
     return contours
@@ -22,7 +110,182 @@ def find_center_of_contour(contour):
     center = Point(int(x+(w/2)), int(y+h/2))
     return center
 
-def hsv_has_color(hsv, lower, upper, threshold):
-    thresh = cv2.inRange(hsv, lower, upper)
-    count = np.sum(np.nonzero(thresh))
-    return count > threshold
\ No newline at end of file
+def hsv_has_color(hsv, lower, upper, threshold, buffers=None):
+    """Whether more than `threshold` pixels of `hsv` are within `lower`..`upper`."""
+    thresh = buffers.in_range(hsv, lower, upper) if buffers else cv2.inRange(hsv, lower, upper)
+    return cv2.countNonZero(thresh) > threshold
+
+
+# Bits kept per BGR channel when quantizing colors for a ColorLUT. The
+# reaction time ranges sit within a few levels of the colors they match, and
+# at 5 bits (a 32x32x32 cube) noisy pixels near their edges were misjudged.
+LUT_BITS = 7
+
+
+class ColorLUT():
+    """Maps BGR colors straight to the HSV ranges they fall within.
+
+    Built once from `ranges` (a name to `(lower, upper)` HSV bounds) by
+    converting the center of every cell of a quantized BGR cube, 2 ** `bits`
+    cells a side.
+    Each cell holds a bitmask of the ranges it is within, so overlapping
+    ranges stay exact and a single gather plus `np.bincount` counts the
+    pixels in every range at once. Colors are judged by their cell's center,
+    so pixels within a few levels of a range's edge can land on either side.
+    """
+
+    def __init__(self, ranges: dict, bits: int = LUT_BITS) -> None:
+        self.names = list(ranges)
+        if len(self.names) > 8:
+            raise ValueError("at most 8 ranges fit in a bitmask, got {}".format(len(self.names)))
+        self._bits = bits
+        self._shift = 8 - bits
+        centers = (np.arange(1 << bits) << self._shift) + (1 << self._shift >> 1)
+        cube = np.stack(np.meshgrid(centers, centers, centers, indexing="ij"), axis=-1).astype(np.uint8)
+        hsv = cv2.cvtColor(cube.reshape(1, -1, 3), cv2.COLOR_BGR2HSV)[0]
+        self._table = np.zeros(len(hsv), dtype=np.uint8)
+        for i, (lower, upper) in enumerate(ranges.values()):
+            within = np.all((hsv >= lower) & (hsv <= upper), axis=1)
+            self._table[within] |= 1 << i
+        # membership[mask, i] is whether bitmask `mask` includes range i.
+        masks = np.arange(1 << len(self.names))
+        self._membership = (masks[:, np.newaxis] >> np.arange(len(self.names))) & 1
+
+    def _index(self, pixels: np.ndarray) -> np.ndarray:
+        shift, bits = self._shift, self._bits
+        if pixels.shape[-1] == 4 and pixels.strides[-1] == 1:
+            # BGRA pixels read as one little-endian word each, so the table
+            # index is three masked shifts of a single array.
+            words = pixels.view("<u4")[..., 0]
+            low_bits = (1 << bits) - 1
+            index = (words & (low_bits << shift)).astype(np.intp) << (2 * bits - shift)
+            index |= (words >> (8 + shift - bits)) & (low_bits << bits)
+            index |= (words >> (16 + shift)) & low_bits
+            return index
+        index = (pixels[..., 0] >> shift).astype(np.intp) << (2 * bits)
+        index |= (pixels[..., 1] >> shift).astype(np.intp) << bits
+        index |= pixels[..., 2] >> shift
+        return index
+
+    def counts(self, pixels: np.ndarray) -> np.ndarray:
+        """Return how many of the BGR(A) `pixels` fall within each range, in `names` order."""
+        masks = self._table[self._index(pixels)]
+        return np.bincount(masks.ravel(), minlength=len(self._membership)) @ self._membership
+
+    def classify(self, pixels: np.ndarray, min_fraction: float) -> str | None:
+        """Return the first range covering at least `min_fraction` of `pixels`."""
+        min_count = min_fraction * pixels.size // pixels.shape[-1]
+        for name, count in zip(self.names, self.counts(pixels).tolist()):
+            if count >= min_count:
+                return name
+        return None
+
+
+class PixelProbe():
+    """Classifies a frame's color from a fixed grid of sample pixels.
+
+    Only the `grid` (rows, columns) samples are gathered and looked up in a
+    ColorLUT built from `ranges`, so no conversion or mask of the frame is
+    made. `ranges` maps a name to its `(lower, upper)` HSV bounds; the first
+    one, in order, covering at least `min_fraction` of the samples wins.
+    """
+
+    def __init__(self, ranges: dict, grid: tuple[int, int] = (8, 8), min_fraction: float = 0.5) -> None:
+        self._lut = ColorLUT(ranges)
+        self._grid = grid
+        self._min_fraction = min_fraction
+        self._shape = None
+        self._rows = None
+        self._columns = None
+
+    def _place(self, shape) -> None:
+        height, width = shape[:2]
+        rows, columns = self._grid
+        ys = ((np.arange(rows) + 0.5) * height / rows).astype(np.intp)
+        xs = ((np.arange(columns) + 0.5) * width / columns).astype(np.intp)
+        self._rows, self._columns = (a.ravel() for a in np.meshgrid(ys, xs, indexing="ij"))
+        self._shape = shape
+
+    def samples(self, image: np.ndarray) -> np.ndarray:
+        if image.shape != self._shape:
+            self._place(image.shape)
+        return image[self._rows, self._columns]
+
+    def counts(self, image: np.ndarray) -> np.ndarray:
+        """Return how many samples fall within each range, in the order of `ranges`."""
+        return self._lut.counts(self.samples(image))
+
+    def classify(self, image: np.ndarray) -> str | None:
+        return self._lut.classify(self.samples(image), self._min_fraction)
+
+
+def locate_grid(image, size=3):
+    """Find a `size` x `size` grid of tiles darker than their background.
+
+    Returns the tiles' `(x, y, w, h)` rects in row-major order, or None when
+    the grid isn't fully visible, e.g. while one of its tiles is lit.
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGRA2GRAY if image.shape[2] == 4 else cv2.COLOR_BGR2GRAY)
+    _, mask = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    rects = sorted((cv2.boundingRect(c) for c in contours), key=lambda r: r[2] * r[3], reverse=True)
+    tiles = rects[:size * size]
+    if len(tiles) < size * size:
+        return None
+    # The tiles are the same size; anything much smaller is noise.
+    areas = [w * h for _, _, w, h in tiles]
+    if min(areas) < 0.8 * max(areas):
+        return None
+    height = tiles[0][3]
+    return sorted(tiles, key=lambda r: (round(r[1] / height), r[0]))
+
+
+class TileTracker():
+    """Tracks which tiles of a grid are lit from a few sampled pixels of each.
+
+    Every frame reduces to one mean brightness per tile, sampled on a
+    `samples` x `samples` grid inside it. A tile turns lit once it rises
+    `on` of the way from its unlit brightness to white, and unlit only once
+    it falls back below `off` of the way, so a flash that flickers around a
+    single threshold is still counted once.
+    """
+
+    def __init__(self, rects, samples: int = 5, on: float = 0.6, off: float = 0.3) -> None:
+        offsets = (np.arange(samples) + 0.5) / samples
+        rows, columns = [], []
+        for x, y, w, h in rects:
+            ys, xs = np.meshgrid(y + offsets * h, x + offsets * w, indexing="ij")
+            rows.append(ys.ravel())
+            columns.append(xs.ravel())
+        self._rows = np.array(rows, dtype=np.intp)
+        self._columns = np.array(columns, dtype=np.intp)
+        self._rects = rects
+        self._on_fraction = on
+        self._off_fraction = off
+        self._on = None
+        self._off = None
+        self._weights = np.array([0.114, 0.587, 0.299])
+        self.lit = np.zeros(len(rects), dtype=bool)
+
+    def levels(self, image: np.ndarray) -> np.ndarray:
+        """Return the mean brightness of each tile."""
+        return (image[self._rows, self._columns, :3] @ self._weights).mean(axis=1)
+
+    def calibrate(self, image: np.ndarray) -> None:
+        """Take the tiles' brightness in `image`, where none is lit, as their unlit level."""
+        unlit = self.levels(image)
+        self._on = unlit + self._on_fraction * (255 - unlit)
+        self._off = unlit + self._off_fraction * (255 - unlit)
+        self.lit[:] = False
+
+    def update(self, image: np.ndarray) -> list:
+        """Return the tiles that turned lit since the last frame."""
+        levels = self.levels(image)
+        turned_on = ~self.lit & (levels > self._on)
+        turned_off = self.lit & (levels < self._off)
+        self.lit ^= turned_on | turned_off
+        return np.flatnonzero(turned_on).tolist()
+
+    def center(self, tile: int) -> Point:
+        x, y, w, h = self._rects[tile]
+        return Point(int(x + w / 2), int(y + h / 2))
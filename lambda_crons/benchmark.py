@@ -0,0 +1,63 @@
+"""Times a handler's per-invocation setup, cold versus warm.
+
+Setup is `_before_run` plus building the SNS client and template every
+function uses. Cold is what every invocation used to pay: a new boto3
+session and client and a freshly compiled template. Warm reuses the ones
+cached by the first invocation in the container. Nothing is sent to AWS.
+Run with:
+
+    python benchmark.py traffic_ticket --invocations 20
+"""
+import argparse
+import importlib
+import os
+import statistics
+import sys
+import time
+
+from invoke import SHARED_HANDLERS_PATH
+
+sys.path.insert(0, SHARED_HANDLERS_PATH)
+from webhook_lib import lambda_handler_base  # noqa: E402  (import after sys.path setup)
+
+
+def setup_seconds(handler, event, cold):
+    if cold:
+        # A new container: nothing cached, and a handler that hasn't made any clients.
+        lambda_handler_base.clear_caches()
+        handler = type(handler)()
+    start = time.perf_counter()
+    handler._before_run(event, None)
+    handler.sns_client
+    handler.sns_template
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("lambda_function_name", help="subdirectory of lambda function")
+    parser.add_argument("--invocations", type=int, default=20)
+    args = parser.parse_args()
+
+    # Lambda sets the region; clients can't be created without one.
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    lambda_function_name = args.lambda_function_name.strip('/')
+    handler = importlib.import_module("{}.lambda_handler".format(lambda_function_name))._handler
+    event = {
+        '_local': {
+            'local_dir': lambda_function_name,
+        },
+    }
+
+    print("{} setup over {} invocations:".format(lambda_function_name, args.invocations))
+    for name, cold in (("cold", True), ("warm", False)):
+        seconds = [setup_seconds(handler, event, cold) for _ in range(args.invocations)]
+        print("  {:<5} median {:7.3f}ms  max {:7.3f}ms".format(
+            name,
+            statistics.median(seconds) * 1000,
+            max(seconds) * 1000,
+        ))
+
+
+if __name__ == '__main__':
+    main()
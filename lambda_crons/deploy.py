@@ -1,4 +1,5 @@
 import argparse
+import hashlib
 import os
 import subprocess
 import time
@@ -15,6 +16,13 @@ KEY_FORMAT = "jobs/{function_name}_{nonce}.zip"
 
 LOCAL_PATH_FORMAT = "packages/{function_name}.zip"
 
+# The shared handler classes, built by `make _layer` (in ../shared/build) and attached to every function.
+LAYER_NAME = "lambda_crons_shared_handlers"
+LAYER_KEY_FORMAT = "layers/shared_handlers_{nonce}.zip"
+LAYER_LOCAL_PATH = "../shared/build/shared_handlers_layer.zip"
+LAYER_BUILD_DIR = "../shared/build/shared_handlers_layer"
+LAYER_DESCRIPTION = "Shared handler base classes (webhook_lib) and Jinja2, sha256:{sha256}"
+
 DEFAULT_AWS_REGION = "us-east-1"
 
 DEFAULT_CONFIG = {
@@ -23,8 +31,12 @@ DEFAULT_CONFIG = {
     "description": "Lambda function: {}",
     "handler": "lambda_function.lambda_handler",
     "enabled": True,
+    "sns_topic_arn": "arn:aws:sns:us-east-1:560983357304:lambda_crons",
 }
 
+# Read by the shared handlers' LambdaHandler to find the topic it notifies.
+SNS_TOPIC_ENV_VAR = "NOTIFY_SNS_TOPIC_ARN"
+
 VALID_TRIGGER_DAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
 
 
@@ -50,6 +62,11 @@ class Deploy:
         self.parser.add_argument("subdir", help="subdirectory of lambda function")
         self.parser.add_argument("--profile", help="AWS profile to use")
         self.parser.add_argument("--region", help="AWS region to use")
+        self.parser.add_argument(
+            "--publish-layer",
+            help="publish a new version of the shared handlers layer even if it hasn't changed",
+            action="store_true",
+        )
 
     def init_aws(self):
         self.aws_profile = self.args.profile
@@ -77,6 +94,45 @@ class Deploy:
         self.s3_client.upload_file(local_file_path, S3_BUCKET, key)
         print("Upload complete!")
 
+    def layer_sha256(self):
+        # Hashes the built files rather than the zip, which embeds their mtimes
+        # and so differs on every build.
+        digest = hashlib.sha256()
+        for dirpath, dirnames, filenames in os.walk(LAYER_BUILD_DIR):
+            dirnames[:] = sorted(d for d in dirnames if d != "__pycache__")
+            for filename in sorted(filenames):
+                path = os.path.join(dirpath, filename)
+                digest.update(os.path.relpath(path, LAYER_BUILD_DIR).encode("utf-8") + b"\0")
+                with open(path, "rb") as f:
+                    digest.update(f.read())
+        return digest.hexdigest()
+
+    def latest_layer_version(self):
+        response = self.lambda_client.list_layer_versions(LayerName=LAYER_NAME, MaxItems=1)
+        versions = response["LayerVersions"]
+        return versions[0] if versions else None
+
+    def publish_layer(self, description):
+        key = LAYER_KEY_FORMAT.format(nonce=self.nonce)
+        print("Uploading {} to {}".format(LAYER_LOCAL_PATH, "{}:::{}".format(S3_BUCKET, key)))
+        self.s3_client.upload_file(LAYER_LOCAL_PATH, S3_BUCKET, key)
+        response = self.lambda_client.publish_layer_version(
+            LayerName=LAYER_NAME,
+            Description=description,
+            Content={"S3Bucket": S3_BUCKET, "S3Key": key},
+        )
+        return response["LayerVersionArn"]
+
+    def layer_arn(self):
+        """The latest layer version if it matches the one just built, else a newly published one."""
+        description = LAYER_DESCRIPTION.format(sha256=self.layer_sha256())
+        latest = None if self.args.publish_layer else self.latest_layer_version()
+        if latest and latest.get("Description") == description:
+            print("Using layer {}".format(latest["LayerVersionArn"]))
+            return latest["LayerVersionArn"]
+        print("Publishing shared handlers layer")
+        return self.publish_layer(description)
+
     def load_function_config(self):
         with open(os.path.join(self.dirpath, "config.yml"), "r") as f:
             self.config = yaml.safe_load(f)
@@ -95,6 +151,7 @@ class Deploy:
                 self.config["description"]
             )
         self.config["handler"] = self.config.get("handler", DEFAULT_CONFIG["handler"])
+        self.config["sns_topic_arn"] = self.config.get("sns_topic_arn", DEFAULT_CONFIG["sns_topic_arn"])
         self.config["s3_bucket"] = self.config["code"]["s3_bucket"]
         self.config["s3_key"] = self.config["code"]["s3_key_format"].format(
             nonce=self.nonce
@@ -173,6 +230,9 @@ class Deploy:
             raise exception
         return True
 
+    def environment(self):
+        return {"Variables": {SNS_TOPIC_ENV_VAR: self.config["sns_topic_arn"]}}
+
     def create_lambda_function(self):
         response = self.lambda_client.create_function(
             FunctionName=self.function_name,
@@ -180,6 +240,8 @@ class Deploy:
             Description=self.config["description"],
             Role=self.config["role"],
             Handler=self.config["handler"],
+            Layers=self.config["layers"],
+            Environment=self.environment(),
             Code={
                 "S3Bucket": self.config["s3_bucket"],
                 "S3Key": self.config["s3_key"],
@@ -196,6 +258,8 @@ class Deploy:
             Runtime=self.config["runtime"],
             Role=self.config["role"],
             Handler=self.config["handler"],
+            Layers=self.config["layers"],
+            Environment=self.environment(),
         )
         response = self.lambda_client.update_function_code(
             FunctionName=self.function_name,
@@ -217,6 +281,8 @@ class Deploy:
         # Uploads the lambda function package to S3
         self.upload_package()
 
+        self.config["layers"] = [self.layer_arn()]
+
         # Delete the old lambda function instead of updating in order to not have to deal with
         # versioning.
         if self.lambda_function_exists():
@@ -1,7 +1,11 @@
 import argparse
 import importlib
+import os
+import sys
 
-import boto3
+
+# The shared handler classes, importable the way the Lambda layer makes them (/opt/python).
+SHARED_HANDLERS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared", "handlers", "python")
 
 
 class Invoke():
@@ -18,6 +22,7 @@ class Invoke():
         self.lambda_function_name = self.args.lambda_function_name.strip('/')
 
     def init_aws(self):
+        import boto3
         self.aws_profile = self.args.profile
         session = (boto3.session.Session(profile_name=self.aws_profile)
                    if self.aws_profile else boto3.session.Session())
@@ -29,6 +34,7 @@ class Invoke():
         self.parser.add_argument("--allow-aws", help="if running locally, enables SNS and DDB calls", action='store_true')
         self.parser.add_argument("--take-input", help="if running locally, allows for user input values in place of parameter store", action='store_true')
         self.parser.add_argument("--profile", help="AWS profile to use")
+        self.parser.add_argument("--import-time", help="if running locally, report the function's cold import time instead of running it", action='store_true')
 
     def _run(self):
         response = self.lambda_client.invoke(
@@ -39,15 +45,26 @@ class Invoke():
     def run(self):
         if not self.args.local:
             self._run()
+            return
+
+        # Is this too hacky? :/
+        sys.path.insert(0, SHARED_HANDLERS_PATH)
+        if self.args.import_time:
+            from webhook_lib.import_time import report_import_time
+            report_import_time(
+                "{}.lambda_handler".format(self.lambda_function_name),
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+                pythonpath=SHARED_HANDLERS_PATH,
+            )
         else:
-            # Is this too hacky? :/
             handler = importlib.import_module("{}.lambda_handler".format(self.lambda_function_name))
             handler.lambda_handler({
-                'local': True,
-                'allow_aws': self.allow_aws,
-                'local_dir': self.lambda_function_name,
-                'take_input': self.take_input,
-                'aws_profile': self.aws_profile,
+                '_local': {
+                    'allow_aws': self.allow_aws,
+                    'local_dir': self.lambda_function_name,
+                    'take_input': self.take_input,
+                    'aws_profile': self.args.profile,
+                },
             }, None)
 
 
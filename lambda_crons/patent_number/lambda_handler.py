@@ -5,7 +5,7 @@ import os
 
 import requests
 
-from base.state_lambda_handler_base import StateLambdaHandler
+from webhook_lib.state_lambda_handler_base import StateLambdaHandler
 
 SEARCH_URL = 'https://ped.uspto.gov/api/queries'
 PAYLOAD_FILE = 'payload.json'
@@ -90,8 +90,12 @@ class PatentNumberLambdaHandler(StateLambdaHandler):
         return result
 
 
+# Module-level singleton; reused across warm invocations.
+_handler = PatentNumberLambdaHandler()
+
+
 def lambda_handler(event, context):
-    return PatentNumberLambdaHandler().handle(event, context)
+    return _handler.handle(event, context)
 
 
 if __name__ == '__main__':
@@ -1,11 +1,6 @@
 from datetime import datetime, date
-from dateutil import parser as date_parser
-import json
-import os
 
-import requests
-
-from base.lambda_handler_base import LambdaHandler
+from webhook_lib.lambda_handler_base import LambdaHandler
 
 PROD_TABLE_NAME = 'salt_level'
 DEV_TABLE_NAME = 'salt_level_local'
@@ -73,8 +68,12 @@ class SaltLevelEntryCheckerLambdaHandler(LambdaHandler):
         }
 
 
+# Module-level singleton; reused across warm invocations.
+_handler = SaltLevelEntryCheckerLambdaHandler()
+
+
 def lambda_handler(event, context):
-    return SaltLevelEntryCheckerLambdaHandler().handle(event, context)
+    return _handler.handle(event, context)
 
 
 if __name__ == '__main__':
@@ -1,10 +1,9 @@
 import json
 import os
 
-import boto3
 import requests
 
-from base.lambda_handler_base import LambdaHandler
+from webhook_lib.lambda_handler_base import LambdaHandler
 
 TOKEN_URL = "http://portal.scscourt.org/api/traffic/token"
 SEARCH_URL = "http://portal.scscourt.org/api/traffic/search"
@@ -20,6 +19,7 @@ class TrafficTicketLambdaHandler(LambdaHandler):
     ddb_state_id = "traffic_ticket_status"
 
     state_keys = {'available'}
+    parameter_names = (SSM_DL_NUMBER, SSM_BIRTHDATE)
 
     def _run(self, event, context):
         response = requests.get(TOKEN_URL)
@@ -47,8 +47,12 @@ class TrafficTicketLambdaHandler(LambdaHandler):
         }
 
 
+# Module-level singleton; reused across warm invocations.
+_handler = TrafficTicketLambdaHandler()
+
+
 def lambda_handler(event, context):
-    return TrafficTicketLambdaHandler().handle(event, context)
+    return _handler.handle(event, context)
 
 
 if __name__ == '__main__':
@@ -1,4 +1,4 @@
-from base.lambda_handler_base import LambdaHandler
+from webhook_lib.lambda_handler_base import LambdaHandler
 
 
 CREATION_EVENT_NAME = "ObjectCreated:Put"
@@ -35,8 +35,12 @@ class MAMEHighScoreLambdaHandler(LambdaHandler):
         }
 
 
+# Module-level singleton; reused across warm invocations.
+_handler = MAMEHighScoreLambdaHandler()
+
+
 def lambda_handler(event, context):
-    return MAMEHighScoreLambdaHandler().handle(event, context)
+    return _handler.handle(event, context)
 
 
 if __name__ == '__main__':
@@ -1,7 +1,36 @@
 import os
 import traceback
 
-import boto3
+from webhook_lib.parameter_cache import ParameterCache
+
+# Shared by every handler in the container, so warm invocations reuse them.
+# boto3 is only imported once a client is needed, keeping it out of cold
+# starts that don't use AWS.
+_sessions = {}
+_clients = {}
+_parameters = ParameterCache()
+
+
+def get_session(profile=None, region=None):
+    key = (profile, region)
+    if key not in _sessions:
+        import boto3
+        _sessions[key] = boto3.session.Session(profile_name=profile, region_name=region)
+    return _sessions[key]
+
+
+def get_client(service, profile=None, region=None):
+    key = (profile, region, service)
+    if key not in _clients:
+        _clients[key] = get_session(profile, region).client(service)
+    return _clients[key]
+
+
+def clear_caches():
+    """Forget every cached session, client and parameter, like a cold start."""
+    _sessions.clear()
+    _clients.clear()
+    _parameters.clear()
 
 
 class BaseHandler:
@@ -11,8 +40,9 @@ class BaseHandler:
     `_before_run` / `_after_run` hooks. Any unhandled exception from `_run`
     is routed to `_handle_error`.
 
-    This is the modern replacement for the old `lambda_crons` /
-    `s3_bucket_lambdas` base classes. Key differences from the old design:
+    This replaced the old per-project `lambda_crons` / `s3_bucket_lambdas`
+    base classes, which now subclass it as `LambdaHandler`. Key differences
+    from the old design:
       * Nothing is hardcoded -- the SNS topic ARN is read from the
         environment (set by SAM) instead of being baked into the class.
       * boto3 clients are created lazily so unit tests don't need AWS.
@@ -25,6 +55,14 @@ class BaseHandler:
     sns_topic_env_var = "NOTIFY_SNS_TOPIC_ARN"
     sns_subject = "Lambda Update"
     sns_subject_error = "Lambda Error!"
+    # None uses the region from the environment, as Lambda sets it.
+    aws_region = None
+    # SSM parameters the handler always needs, fetched in one batch before
+    # `_run`, and optional per-name TTLs for them in seconds.
+    parameter_names = ()
+    parameter_ttls = {}
+    # Whether SSM SecureString parameters are decrypted (needs kms:Decrypt).
+    parameter_decrypt = True
 
     def __init__(self):
         self.is_local = False
@@ -47,6 +85,8 @@ class BaseHandler:
 
     def _before_run(self, event, context):
         self._parse_local_flags(event)
+        if self.parameter_names and self.allow_aws:
+            self.get_parameters(self.parameter_names)
 
     def _run(self, event, context):
         raise NotImplementedError
@@ -78,34 +118,39 @@ class BaseHandler:
     @property
     def session(self):
         if self._session is None:
-            self._session = (
-                boto3.session.Session(profile_name=self.aws_profile)
-                if self.aws_profile
-                else boto3.session.Session()
-            )
+            self._session = get_session(self.aws_profile, self.aws_region)
         return self._session
 
     @property
     def sns_client(self):
         if self._sns_client is None:
-            self._sns_client = self.session.client("sns")
+            self._sns_client = get_client("sns", self.aws_profile, self.aws_region)
         return self._sns_client
 
     @property
     def ssm_client(self):
         if self._ssm_client is None:
-            self._ssm_client = self.session.client("ssm")
+            self._ssm_client = get_client("ssm", self.aws_profile, self.aws_region)
         return self._ssm_client
 
     @property
     def sns_topic_arn(self):
         return os.environ.get(self.sns_topic_env_var) or None
 
-    def get_parameter(self, name, decrypt=True):
-        """Read an SSM parameter. Falls back to env/stdin in local mode."""
+    def get_parameters(self, names, decrypt=None):
+        """Read SSM parameters as `{name: value}`, batched and cached."""
+        if decrypt is None:
+            decrypt = self.parameter_decrypt
+        if self.allow_aws:
+            return _parameters.get_parameters(self.ssm_client, names, decrypt, self.parameter_ttls)
+        return {name: self.get_parameter(name, decrypt) for name in names}
+
+    def get_parameter(self, name, decrypt=None):
+        """Read an SSM parameter, cached. Falls back to env/stdin in local mode."""
+        if decrypt is None:
+            decrypt = self.parameter_decrypt
         if self.allow_aws:
-            resp = self.ssm_client.get_parameter(Name=name, WithDecryption=decrypt)
-            return resp["Parameter"]["Value"]
+            return _parameters.get_parameter(self.ssm_client, name, decrypt, self.parameter_ttls)
         if self.is_local and self.take_input:
             return input(f"Value for SSM parameter {name}: ")
         value = os.environ.get(name)
@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+
+# Slowest imports listed by `report_import_time`.
+IMPORT_TIME_TOP = 10
+
+
+def report_import_time(module, cwd, pythonpath, top=IMPORT_TIME_TOP):
+    """Print the cold import time of `module` and its slowest direct imports.
+
+    The import runs in a fresh interpreter, so nothing is imported yet, as on
+    a cold start. If it fails, its traceback is printed and this exits with
+    the interpreter's status.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import {}".format(module)],
+        cwd=cwd,
+        env=dict(os.environ, PYTHONPATH=pythonpath),
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    lines = result.stderr.splitlines()
+    if result.returncode:
+        print("\n".join(line for line in lines if not line.startswith("import time:")), file=sys.stderr)
+        sys.exit(result.returncode)
+
+    # Modules are listed after everything they import, indented two spaces a level.
+    total = None
+    imports = []
+    for line in lines:
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 0 and name.strip() == module:
+            total = int(cumulative)
+            break
+        imports = [] if depth == 0 else imports + [(int(cumulative), depth, name.strip())]
+    if total is None:
+        sys.exit("{} was already imported at startup, nothing to time".format(module))
+
+    print("Cold import of {}: {:.1f}ms".format(module, total / 1000))
+    direct = [(us, name) for us, depth, name in imports if depth == 1]
+    for us, name in sorted(direct, reverse=True)[:top]:
+        print("  {:8.1f}ms  {}".format(us / 1000, name))
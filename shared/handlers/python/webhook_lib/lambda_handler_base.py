@@ -0,0 +1,114 @@
+import os
+import traceback
+
+from webhook_lib import base_handler
+from webhook_lib.base_handler import BaseHandler, get_client
+
+# Where `make _package` puts a function's compiled templates, next to its sources.
+COMPILED_TEMPLATES_DIR = "compiled_templates"
+
+# Shared across warm invocations, like the clients. jinja2 is only imported
+# by functions that render a template.
+_template_envs = {}
+_templates = {}
+
+
+def get_template_env(search_path, precompiled=False):
+    """Templates from `search_path`, or its precompiled ones when asked and they're there."""
+    key = (search_path, precompiled)
+    if key not in _template_envs:
+        import jinja2
+        compiled_path = os.path.join(search_path, COMPILED_TEMPLATES_DIR)
+        if precompiled and os.path.isdir(compiled_path):
+            template_loader = jinja2.ModuleLoader(compiled_path)
+        else:
+            template_loader = jinja2.FileSystemLoader(searchpath=search_path)
+        _template_envs[key] = jinja2.Environment(loader=template_loader)
+    return _template_envs[key]
+
+
+def get_template(search_path, filename, precompiled=False):
+    key = (search_path, filename, precompiled)
+    if key not in _templates:
+        _templates[key] = get_template_env(search_path, precompiled).get_template(filename)
+    return _templates[key]
+
+
+def compile_templates(search_path):
+    """Compile the templates in `search_path` to Python, for packaging with the function."""
+    import jinja2
+    template_env = jinja2.Environment(loader=jinja2.FileSystemLoader(searchpath=search_path))
+    template_env.compile_templates(
+        os.path.join(search_path, COMPILED_TEMPLATES_DIR),
+        extensions=["jinja2"],
+        zip=None,
+    )
+
+
+def clear_caches():
+    """Forget every cached session, client, parameter and template, like a cold start."""
+    base_handler.clear_caches()
+    _template_envs.clear()
+    _templates.clear()
+
+
+class LambdaHandler(BaseHandler):
+    """Base for scheduled (`lambda_crons`) and S3-triggered functions.
+
+    `_run` returns a dict that is rendered through the function's
+    `sns_template.jinja2` and published to the topic in NOTIFY_SNS_TOPIC_ARN,
+    which `deploy.py` sets. Unlike the base, errors are notified but not
+    re-raised: a retried cron would only fail and notify again, and SSM
+    parameters are read without decryption, as these functions always have.
+    Local runs read their templates from `local_dir`, which `invoke.py` sets
+    under the event's `_local` key.
+    """
+
+    sns_subject_template = "Lambda Cron Update"
+    sns_subject_error = "Lambda Cron Error!"
+    sns_template_filename = "sns_template.jinja2"
+    # Their parameters are plain Strings, and their role has no kms:Decrypt.
+    parameter_decrypt = False
+
+    def __init__(self):
+        super().__init__()
+        self.local_dir = None
+        self._ddb_client = None
+
+    def _parse_local_flags(self, event):
+        super()._parse_local_flags(event)
+        meta = event.get("_local", {}) if isinstance(event, dict) else {}
+        self.local_dir = meta.get("local_dir")
+
+    @property
+    def ddb_client(self):
+        if self._ddb_client is None:
+            self._ddb_client = get_client("dynamodb", self.aws_profile, self.aws_region)
+        return self._ddb_client
+
+    @property
+    def template_search_path(self):
+        return f"{self.local_dir}/" if self.is_local else "./"
+
+    @property
+    def template_env(self):
+        # Packaged functions load precompiled templates; local runs use the sources.
+        return get_template_env(self.template_search_path, precompiled=not self.is_local)
+
+    @property
+    def sns_template(self):
+        return get_template(self.template_search_path, self.sns_template_filename, precompiled=not self.is_local)
+
+    def _after_run(self, result):
+        content = self.build_content_from_result(result)
+        if content:
+            self.notify(self.sns_subject_template, content)
+
+    def _handle_error(self, e):
+        traceback.print_exc()
+        content = f"Hello! Looks like {self.__class__.__name__} failed...\n"
+        content += f"Here's the exception: \n{e}"
+        self.notify(self.sns_subject_error, content)
+
+    def build_content_from_result(self, result):
+        return self.sns_template.render(**result)
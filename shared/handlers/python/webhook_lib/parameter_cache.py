@@ -0,0 +1,49 @@
+import time
+
+# How long a fetched value is reused, unless its name has its own TTL.
+DEFAULT_TTL_SECONDS = 300
+# SSM's GetParameters accepts at most this many names per call.
+GET_PARAMETERS_LIMIT = 10
+
+
+class ParameterCache:
+    """SSM parameter values, reused until their TTL runs out.
+
+    Lives at module level, so warm invocations skip SSM entirely until a
+    value expires. Whatever isn't cached is fetched with as few
+    `GetParameters` calls as possible.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL_SECONDS, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self._values = {}
+
+    def get_parameters(self, ssm_client, names, decrypt=True, ttls=None):
+        """Return `{name: value}` for `names`; `ttls` optionally sets seconds per name."""
+        now = self.clock()
+        values = {}
+        missing = []
+        for name in dict.fromkeys(names):
+            cached = self._values.get((name, decrypt))
+            if cached and cached[1] > now:
+                values[name] = cached[0]
+            else:
+                missing.append(name)
+
+        for start in range(0, len(missing), GET_PARAMETERS_LIMIT):
+            resp = ssm_client.get_parameters(Names=missing[start:start + GET_PARAMETERS_LIMIT], WithDecryption=decrypt)
+            if resp.get("InvalidParameters"):
+                raise ValueError(f"SSM parameters not found: {', '.join(resp['InvalidParameters'])}")
+            for parameter in resp["Parameters"]:
+                name = parameter["Name"]
+                ttl = (ttls or {}).get(name, self.ttl)
+                self._values[(name, decrypt)] = (parameter["Value"], now + ttl)
+                values[name] = parameter["Value"]
+        return values
+
+    def get_parameter(self, ssm_client, name, decrypt=True, ttls=None):
+        return self.get_parameters(ssm_client, [name], decrypt, ttls)[name]
+
+    def clear(self):
+        self._values.clear()
@@ -1,7 +1,7 @@
 import datetime
 import json
 
-from .lambda_handler_base import LambdaHandler
+from webhook_lib.lambda_handler_base import LambdaHandler
 
 
 STATE_TABLE = 'states'
@@ -11,9 +11,7 @@ class StateLambdaHandler(LambdaHandler):
     def _after_run(self, result):
         state = self.build_state_from_result(result)
         self.put_state(state)
-        content = self.build_content_from_result(result)
-        if content:
-            self.send_sns(self.sns_subject_template, content)
+        super()._after_run(result)
 
     def build_state_from_result(self, result):
         state = {}
@@ -25,13 +25,37 @@ os.environ["GITHUB_WEBHOOK_SECRET_PARAM"] = SECRET_PARAM
 os.environ[SECRET_PARAM] = SECRET
 
 import app  # noqa: E402  (import after sys.path / env setup)
+from webhook_lib import base_handler  # noqa: E402
+
+
+class FakeSSM:
+    """Stands in for the SSM client, counting round trips."""
+
+    def __init__(self, values):
+        self.values = values
+        self.calls = 0
+
+    def get_parameters(self, Names, WithDecryption=False):
+        self.calls += 1
+        return {
+            "Parameters": [{"Name": n, "Value": self.values[n]} for n in Names if n in self.values],
+            "InvalidParameters": [n for n in Names if n not in self.values],
+        }
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
 
 
 def _sign(body_bytes):
     return "sha256=" + hmac.new(SECRET.encode(), body_bytes, hashlib.sha256).hexdigest()
 
 
-def _event(body, signature, event_type="push"):
+def _event(body, signature, event_type="push", allow_aws=False):
     body_str = json.dumps(body)
     return {
         "version": "2.0",
@@ -43,7 +67,7 @@ def _event(body, signature, event_type="push"):
         },
         # `_local` keeps the handler in local mode: get_parameter falls back to
         # the env var above instead of calling SSM.
-        "_local": {"allow_aws": False},
+        "_local": {"allow_aws": allow_aws},
         "body": body_str,
         "isBase64Encoded": False,
     }
@@ -90,6 +114,28 @@ def run():
     resp = app.lambda_handler(evt, None)
     check("invalid JSON returns 400", resp["statusCode"] == 400)
 
+    # 5. With SSM, the secret is fetched once and reused until its TTL runs out.
+    ssm = FakeSSM({SECRET_PARAM: SECRET, "a": "1", "b": "2"})
+    clock = FakeClock()
+    cache = base_handler._parameters
+    cache.clear()
+    cache.clock = clock
+    app._handler._ssm_client = ssm
+    for _ in range(3):
+        resp = app.lambda_handler(_event(push_body, _sign(body_bytes), allow_aws=True), None)
+    check("cached secret still verifies", resp["statusCode"] == 200)
+    check("3 deliveries make 1 SSM round trip", ssm.calls == 1)
+    clock.now += cache.ttl + 1
+    app.lambda_handler(_event(push_body, _sign(body_bytes), allow_aws=True), None)
+    check("expired secret is fetched again", ssm.calls == 2)
+
+    # 6. get_parameters batches whatever isn't cached into one call.
+    values = app._handler.get_parameters([SECRET_PARAM, "a", "b"])
+    check("batch returns every value", values == {SECRET_PARAM: SECRET, "a": "1", "b": "2"})
+    check("batch fetches only uncached names in 1 round trip", ssm.calls == 3)
+    app._handler.get_parameters(["a", "b"])
+    check("cached batch makes no round trip", ssm.calls == 3)
+
     print(f"\n{passed} passed, {failed} failed")
     return 0 if failed == 0 else 1
 